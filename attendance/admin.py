@@ -0,0 +1,6 @@
+from django.contrib import admin
+from .models import AttendanceSession, AttendanceRecord, CameraSource
+
+admin.site.register(AttendanceSession)
+admin.site.register(AttendanceRecord)
+admin.site.register(CameraSource)
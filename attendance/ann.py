@@ -0,0 +1,180 @@
+# attendance/ann.py
+
+import numpy as np
+
+from .gallery import _normalize
+
+
+class _InvertedList:
+    """Growable block of vectors and ids that belong to one centroid."""
+
+    def __init__(self, dim):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.size = 0
+
+    def append(self, student_id, vec):
+        if self.size == len(self.ids):
+            capacity = max(8, 2 * len(self.ids))
+            vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            ids = np.empty(capacity, dtype=np.int64)
+            vectors[:self.size] = self.vectors[:self.size]
+            ids[:self.size] = self.ids[:self.size]
+            self.vectors, self.ids = vectors, ids
+        self.vectors[self.size] = vec
+        self.ids[self.size] = student_id
+        self.size += 1
+        return self.size - 1
+
+    def pop(self, pos):
+        """Remove the entry at `pos` by moving the last one into it. Returns the moved id."""
+        last = self.size - 1
+        moved = None
+        if pos != last:
+            self.vectors[pos] = self.vectors[last]
+            self.ids[pos] = self.ids[last]
+            moved = int(self.ids[pos])
+        self.size = last
+        return moved
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index in pure NumPy.
+
+    Vectors are clustered around `nlist` centroids (spherical k-means) and a
+    query only scans the `nprobe` closest clusters. Raising nprobe trades
+    speed for recall; nprobe == nlist is an exact search. New students are
+    assigned to their nearest centroid, and the centroids are retrained
+    once the index has grown well past the size it was trained on.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, train_iters=10, retrain_factor=4, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+
+        self.centroids = None
+        self.lists = []
+        self._where = {}
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _train(self, vectors):
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        # k-means on a sample is plenty to place the centroids.
+        sample = vectors
+        if n > 64 * nlist:
+            sample = vectors[rng.choice(n, 64 * nlist, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty clusters instead of leaving dead centroids.
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self._trained_size = n
+
+    def build(self, ids, vectors):
+        """(Re)train the centroids on `vectors` and index all of them."""
+        vectors = _normalize(vectors)
+        self.centroids = None
+        self.lists = []
+        self._where = {}
+        if len(vectors) == 0:
+            return
+
+        self._train(vectors)
+        self.lists = [_InvertedList(vectors.shape[1]) for _ in range(len(self.centroids))]
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        for sid, vec, lst in zip(np.asarray(ids).tolist(), vectors, assign.tolist()):
+            self._where[sid] = (lst, self.lists[lst].append(sid, vec))
+
+    def _all(self):
+        ids = np.concatenate([lst.ids[:lst.size] for lst in self.lists])
+        vectors = np.concatenate([lst.vectors[:lst.size] for lst in self.lists])
+        return ids, vectors
+
+    def add(self, student_id, vec):
+        student_id = int(student_id)
+        vec = _normalize(vec).reshape(-1)
+        self.remove(student_id)
+
+        if not self.is_trained:
+            self.build([student_id], vec[None])
+            return
+
+        lst = int(np.argmax(self.centroids @ vec))
+        self._where[student_id] = (lst, self.lists[lst].append(student_id, vec))
+
+        if len(self._where) > self.retrain_factor * self._trained_size:
+            self.build(*self._all())
+
+    def remove(self, student_id):
+        loc = self._where.pop(int(student_id), None)
+        if loc is None:
+            return False
+        lst, pos = loc
+        moved = self.lists[lst].pop(pos)
+        if moved is not None:
+            self._where[moved] = (lst, pos)
+        return True
+
+    def search(self, queries, k=1, nprobe=None):
+        """
+        Return (ids, distances) shaped (n, k), sorted by cosine distance.
+        Missing results hold id -1 and distance inf.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        n = len(queries)
+        out_ids = np.full((n, k), -1, dtype=np.int64)
+        out_dists = np.full((n, k), np.inf, dtype=np.float32)
+        if n == 0 or not self.is_trained:
+            return out_ids, out_dists
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        # Scan each probed list once for all the queries that picked it.
+        cand_ids = [[] for _ in range(n)]
+        cand_sims = [[] for _ in range(n)]
+        for lst in np.unique(probes):
+            block = self.lists[lst]
+            if block.size == 0:
+                continue
+            rows = np.flatnonzero((probes == lst).any(axis=1))
+            sims = queries[rows] @ block.vectors[:block.size].T
+            for r, s in zip(rows.tolist(), sims):
+                cand_ids[r].append(block.ids[:block.size])
+                cand_sims[r].append(s)
+
+        for r in range(n):
+            if not cand_ids[r]:
+                continue
+            ids = np.concatenate(cand_ids[r])
+            sims = np.concatenate(cand_sims[r])
+            kk = min(k, len(ids))
+            top = np.argpartition(-sims, kk - 1)[:kk]
+            top = top[np.argsort(-sims[top])]
+            out_ids[r, :kk] = ids[top]
+            out_dists[r, :kk] = 1.0 - sims[top]
+
+        return out_ids, out_dists
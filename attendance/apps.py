@@ -0,0 +1,11 @@
+# attendance/apps.py
+
+from django.apps import AppConfig
+
+
+class AttendanceConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'attendance'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,168 @@
+# attendance/broadcast.py
+
+import itertools
+import threading
+
+from django.db import connection
+
+
+class FrameBroadcast:
+    """
+    Fans one producer's encoded frames out to any number of viewers.
+
+    A single thread iterates `produce()` (e.g. gen_frames: capture,
+    recognition and JPEG encoding) and publishes each chunk into one
+    shared slot. Every subscriber reads the newest chunk it has not seen,
+    so a slow viewer skips frames (counted as dropped) instead of holding
+    up the producer or the other viewers. The producer starts with the
+    first subscriber and stops when the last one leaves (or the source
+    ends); a stopped broadcast leaves the registry (see subscribe()).
+    """
+
+    def __init__(self, key, produce):
+        self.key = key
+        self.name = str(key)
+        self.produce = produce
+        self.frames = 0
+        self._latest = None  # (seq, chunk)
+        self._ended = False
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._cond = threading.Condition()
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        with self._cond:
+            sub = Subscriber(self, next(self._ids))
+            self._subscribers[sub.id] = sub
+            if self._thread is None:
+                self._start()
+        return sub
+
+    def _start(self):
+        self._ended = False
+        self._latest = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _unsubscribe(self, sub):
+        with self._cond:
+            self._subscribers.pop(sub.id, None)
+            self._cond.notify_all()
+
+    def _run(self):
+        chunks = self.produce()
+        idle = False
+        try:
+            for chunk in chunks:
+                with self._cond:
+                    if not self._subscribers:
+                        idle = True
+                        break
+                    self.frames += 1
+                    self._latest = (self.frames, chunk)
+                    self._cond.notify_all()
+        except Exception as e:
+            print(f"[BROADCAST] {self.name} stopped: {type(e).__name__}: {e}")
+        finally:
+            # Runs the producer's own cleanup (capture, pipeline, marker flush).
+            chunks.close()
+            connection.close()
+            with _broadcasts_lock, self._cond:
+                self._thread = None
+                if self._subscribers and idle:
+                    # Someone subscribed while we were shutting down.
+                    self._start()
+                else:
+                    self._ended = True
+                    # The next viewer starts a fresh broadcast.
+                    if _broadcasts.get(self.key) is self:
+                        del _broadcasts[self.key]
+                self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait for the producer to stop and finish its cleanup."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _next(self, after_seq, timeout):
+        with self._cond:
+            while self._latest is None or self._latest[0] <= after_seq:
+                if self._ended or not self._cond.wait(timeout):
+                    return None
+            return self._latest
+
+    def stats(self):
+        with self._cond:
+            subscribers = [s.stats() for s in self._subscribers.values()]
+        return {
+            "name": self.name,
+            "viewers": len(subscribers),
+            "frames": self.frames,
+            "subscribers": subscribers,
+        }
+
+
+class Subscriber:
+    """One viewer of a FrameBroadcast; iterate frames() to stream it."""
+
+    def __init__(self, broadcast, sub_id):
+        self.broadcast = broadcast
+        self.id = sub_id
+        self.delivered = 0
+        self.dropped = 0
+        self._last_seq = None
+
+    def frames(self, timeout=10.0):
+        try:
+            while True:
+                item = self.broadcast._next(self._last_seq or 0, timeout)
+                if item is None:
+                    return
+                seq, chunk = item
+                if self._last_seq is not None:
+                    self.dropped += seq - self._last_seq - 1
+                self._last_seq = seq
+                self.delivered += 1
+                yield chunk
+        finally:
+            self.broadcast._unsubscribe(self)
+
+    def stats(self):
+        seen = self.delivered + self.dropped
+        return {
+            "id": self.id,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "drop_rate": round(self.dropped / seen, 3) if seen else 0.0,
+        }
+
+
+_broadcasts = {}
+_broadcasts_lock = threading.Lock()
+
+
+def subscribe(key, produce):
+    """
+    Subscribe to the running FrameBroadcast for `key`, starting one with
+    `produce` if there is none. Returns the Subscriber.
+    """
+    # Under the registry lock, so a broadcast that is stopping either takes
+    # the new viewer and restarts, or has already left the registry.
+    with _broadcasts_lock:
+        broadcast = _broadcasts.get(key)
+        if broadcast is None:
+            broadcast = _broadcasts[key] = FrameBroadcast(key, produce)
+        return broadcast.subscribe()
+
+
+def broadcast_stats(session_id):
+    """Viewer and drop stats of every broadcast of a session (keys are (session_id, source))."""
+    with _broadcasts_lock:
+        broadcasts = [b for key, b in _broadcasts.items() if key[0] == session_id]
+    return [b.stats() for b in broadcasts if b.viewers]
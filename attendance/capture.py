@@ -0,0 +1,178 @@
+# attendance/capture.py
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+def parse_source(source):
+    """Camera index for digit strings ("0"), otherwise a file path or stream URL."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+def _is_file(source):
+    return isinstance(source, str) and "://" not in source
+
+
+class CaptureService:
+    """
+    Owns one capture device in a dedicated thread.
+
+    The thread keeps only the newest frames in a small ring buffer, so any
+    number of consumers can read without blocking each other or the
+    device: each one simply gets the latest frame it has not seen yet. The
+    device is opened on the first subscription and released when the last
+    subscriber leaves. Video files are paced at their own frame rate so
+    they can stand in for live cameras.
+    """
+
+    def __init__(self, source, buffer_size=4, max_failures=50):
+        self.source = parse_source(source)
+        self.buffer_size = buffer_size
+        self.max_failures = max_failures
+
+        self._frames = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._consumers = 0
+        self._ended = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    @property
+    def consumers(self):
+        return self._consumers
+
+    def subscribe(self):
+        with self._cond:
+            self._consumers += 1
+            if self._thread is None:
+                self._ended = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return CaptureSubscription(self)
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._consumers -= 1
+            self._cond.notify_all()
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.source)
+        print(f"[CAPTURE] Opened source {self.source!r}")
+        fps = cap.get(cv2.CAP_PROP_FPS) if _is_file(self.source) else 0
+        frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        failures = 0
+        next_frame = time.perf_counter()
+        idle = False
+
+        try:
+            while True:
+                with self._cond:
+                    if self._consumers <= 0:
+                        idle = True
+                        break
+
+                success, frame = cap.read()
+                if not success:
+                    failures += 1
+                    # Files end; cameras may hiccup a few times first.
+                    if _is_file(self.source) or failures >= self.max_failures:
+                        break
+                    time.sleep(0.02)
+                    continue
+                failures = 0
+
+                with self._cond:
+                    self._seq += 1
+                    self._frames.append((self._seq, frame))
+                    self._cond.notify_all()
+
+                if frame_interval:
+                    next_frame += frame_interval
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            cap.release()
+            print(f"[CAPTURE] Released source {self.source!r}")
+            with self._cond:
+                self._thread = None
+                self._frames.clear()
+                if self._consumers > 0:
+                    if idle:
+                        # Someone subscribed while we were shutting down.
+                        self._thread = threading.Thread(target=self._run, daemon=True)
+                        self._thread.start()
+                    else:
+                        self._ended = True
+                self._cond.notify_all()
+
+    def read(self, after_seq, timeout=5.0):
+        """
+        Newest (seq, frame) with seq > after_seq. Returns None when the source
+        has ended or no frame arrived within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._frames or self._frames[-1][0] <= after_seq:
+                if self._ended:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._frames[-1]
+
+
+class CaptureSubscription:
+    """
+    One consumer of a CaptureService. read() mirrors cv2.VideoCapture.read()
+    and returns a private copy of the newest frame, safe to draw on.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.last_seq = 0
+        self.skipped = 0
+        self._closed = False
+
+    def read(self, timeout=5.0):
+        item = self.service.read(self.last_seq, timeout)
+        if item is None:
+            return False, None
+        seq, frame = item
+        if self.last_seq:
+            self.skipped += seq - self.last_seq - 1
+        self.last_seq = seq
+        return True, frame.copy()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.service._unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_capture(source=0):
+    """
+    Process-wide CaptureService for a source (camera index, file or URL).
+    """
+    source = parse_source(source)
+    with _services_lock:
+        service = _services.get(source)
+        if service is None:
+            service = _services[source] = CaptureService(source)
+        return service
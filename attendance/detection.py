@@ -0,0 +1,272 @@
+# attendance/detection.py
+
+import csv
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+
+# Face detector used unless a camera picks another: "haar", "yunet", "ssd" or "deepface:<backend>".
+DETECTOR = getattr(settings, "FACE_DETECTOR", "haar")
+# Frames wider than this are downscaled before face detection; None detects at full resolution.
+DETECT_WIDTH = getattr(settings, "FACE_DETECT_WIDTH", 640)
+# Smallest and largest face to look for, in full-resolution pixels (None: no limit).
+MIN_FACE_SIZE = getattr(settings, "FACE_MIN_SIZE", None)
+MAX_FACE_SIZE = getattr(settings, "FACE_MAX_SIZE", None)
+# Model files of the OpenCV DNN detectors (see README); relative paths are under BASE_DIR.
+YUNET_MODEL = getattr(settings, "FACE_YUNET_MODEL", "models/face_detection_yunet_2023mar.onnx")
+SSD_PROTOTXT = getattr(settings, "FACE_SSD_PROTOTXT", "models/deploy.prototxt")
+SSD_MODEL = getattr(settings, "FACE_SSD_MODEL", "models/res10_300x300_ssd_iter_140000.caffemodel")
+# Detections scored below this are dropped by the DNN detectors.
+DNN_CONFIDENCE = getattr(settings, "FACE_DNN_CONFIDENCE", 0.6)
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+
+# Detection settings of one camera; see CameraSource.detect_options().
+DetectOptions = namedtuple(
+    "DetectOptions", "width min_size max_size detector",
+    defaults=(DETECT_WIDTH, MIN_FACE_SIZE, MAX_FACE_SIZE, DETECTOR),
+)
+
+
+def detection_scale(frame_width, width):
+    """Factor frames are resized by for detection (at most 1)."""
+    if not width or frame_width <= width:
+        return 1.0
+    return width / frame_width
+
+
+def _model_path(path):
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(settings.BASE_DIR) / path
+    if not path.is_file():
+        raise FileNotFoundError(f"Face detector model not found: {path}")
+    return str(path)
+
+
+class FaceDetector:
+    """
+    Base class of the face detector backends.
+
+    detect() downscales the frame to the configured detection width,
+    calls _detect() on it and maps the boxes back to full resolution, so
+    crops for embedding keep every pixel. Backends that take grayscale
+    input set `grayscale`; _detect() gets face size limits in detection
+    pixels and returns (x, y, w, h) boxes in the same pixels.
+    """
+
+    name = None
+    grayscale = False
+
+    def _detect(self, image, min_side, max_side):
+        raise NotImplementedError
+
+    def detect(self, frame, options=None):
+        """Face boxes of a BGR frame as an (n, 4) int array of (x, y, w, h)."""
+        options = options or DetectOptions()
+        h, w = frame.shape[:2]
+        scale = detection_scale(w, options.width)
+
+        image = frame
+        if self.grayscale and frame.ndim == 3:
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        elif not self.grayscale and frame.ndim == 2:
+            image = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if scale < 1.0:
+            image = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+        min_side = max(1, round(options.min_size * scale)) if options.min_size else None
+        max_side = max(1, round(options.max_size * scale)) if options.max_size else None
+        boxes = np.asarray(self._detect(image, min_side, max_side), dtype=np.float32).reshape(-1, 4)
+        if len(boxes) == 0:
+            return np.empty((0, 4), dtype=np.int32)
+
+        boxes = np.rint(boxes / scale).astype(np.int32)
+        boxes[:, 0] = boxes[:, 0].clip(0, w - 1)
+        boxes[:, 1] = boxes[:, 1].clip(0, h - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], w - boxes[:, 0]).clip(1, None)
+        boxes[:, 3] = np.minimum(boxes[:, 3], h - boxes[:, 1]).clip(1, None)
+        return boxes
+
+
+def _size_filter(boxes, min_side, max_side):
+    """Face size limits for backends that cannot apply them while detecting."""
+    keep = []
+    for box in boxes:
+        side = max(box[2], box[3])
+        if (min_side is None or side >= min_side) and (max_side is None or side <= max_side):
+            keep.append(box)
+    return keep
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade: no model download, fast on small frames, frontal faces only."""
+
+    name = "haar"
+    grayscale = True
+
+    def __init__(self, cascade_path=CASCADE_PATH):
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Cannot load Haar cascade: {cascade_path}")
+
+    def _detect(self, image, min_side, max_side):
+        kwargs = {}
+        if min_side:
+            kwargs["minSize"] = (min_side, min_side)
+        if max_side:
+            kwargs["maxSize"] = (max_side, max_side)
+        return self.cascade.detectMultiScale(image, scaleFactor=1.2, minNeighbors=5, **kwargs)
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV's YuNet CNN (cv2.FaceDetectorYN): small, CPU friendly, handles turned faces."""
+
+    name = "yunet"
+
+    def __init__(self, model_path=YUNET_MODEL, confidence=DNN_CONFIDENCE):
+        self.net = cv2.FaceDetectorYN.create(_model_path(model_path), "", (320, 320), confidence)
+        self._input_size = (320, 320)
+        # The net is shared by every stream of the engine and keeps its input size.
+        self._lock = threading.Lock()
+
+    def _detect(self, image, min_side, max_side):
+        size = (image.shape[1], image.shape[0])
+        with self._lock:
+            if size != self._input_size:
+                self.net.setInputSize(size)
+                self._input_size = size
+            _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        return _size_filter(faces[:, :4], min_side, max_side)
+
+
+class SSDDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD (Caffe), run at 300x300 on the CPU."""
+
+    name = "ssd"
+
+    def __init__(self, prototxt=SSD_PROTOTXT, model_path=SSD_MODEL, confidence=DNN_CONFIDENCE):
+        self.net = cv2.dnn.readNetFromCaffe(_model_path(prototxt), _model_path(model_path))
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+        self._lock = threading.Lock()
+
+    def _detect(self, image, min_side, max_side):
+        h, w = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = []
+        for x1, y1, x2, y2 in detections[:, 3:7] * np.array([w, h, w, h], dtype=np.float32):
+            boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return _size_filter(boxes, min_side, max_side)
+
+
+class DeepFaceDetector(FaceDetector):
+    """Any detector backend of DeepFace.extract_faces (retinaface, mtcnn, ...)."""
+
+    def __init__(self, backend="opencv"):
+        self.backend = backend
+        self.name = f"deepface:{backend}"
+
+    def _detect(self, image, min_side, max_side):
+        from deepface import DeepFace
+
+        faces = DeepFace.extract_faces(
+            image, detector_backend=self.backend, enforce_detection=False, align=False,
+        )
+        # Without a detection DeepFace returns the whole image with confidence 0.
+        boxes = [
+            tuple(face["facial_area"][k] for k in ("x", "y", "w", "h"))
+            for face in faces if face.get("confidence")
+        ]
+        return _size_filter(boxes, min_side, max_side)
+
+
+DETECTORS = {
+    "haar": HaarDetector,
+    "yunet": YuNetDetector,
+    "ssd": SSDDetector,
+}
+
+
+def make_detector(name=None):
+    """Build a detector by name: "haar", "yunet", "ssd" or "deepface:<backend>"."""
+    name = name or DETECTOR
+    if name.startswith("deepface:"):
+        return DeepFaceDetector(name.split(":", 1)[1])
+    try:
+        return DETECTORS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown face detector: {name} (expected {', '.join(DETECTORS)} or deepface:<backend>)"
+        )
+
+
+def load_labelled_images(csv_path):
+    """
+    A labelled detection set: a CSV with columns image, x, y, w, h and one
+    row per face (empty box columns for an image without faces). Image
+    paths are relative to the CSV. Returns a list of (image, boxes).
+    """
+    root = Path(csv_path).parent
+    labels = {}
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"image", "x", "y", "w", "h"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+        for row in reader:
+            boxes = labels.setdefault(row["image"].strip(), [])
+            if all((row[k] or "").strip() for k in "xywh"):
+                boxes.append(tuple(int(float(row[k])) for k in "xywh"))
+
+    samples = []
+    for name, boxes in labels.items():
+        image = cv2.imread(str(root / name))
+        if image is None:
+            raise ValueError(f"Cannot read image {root / name}")
+        samples.append((image, boxes))
+    return samples
+
+
+def evaluate_detector(detector, samples, options=None, min_iou=0.4):
+    """
+    Run a detector over labelled (image, true boxes) samples. Returns
+    latency and recall/precision at `min_iou`, each true face matching at
+    most one detection.
+    """
+    from .face_utils import _iou
+
+    hits = found_total = truth_total = 0
+    elapsed = 0.0
+    for image, truth in samples:
+        start = time.perf_counter()
+        found = detector.detect(image, options)
+        elapsed += time.perf_counter() - start
+        free = [tuple(b) for b in found]
+        for box in truth:
+            best = max(free, key=lambda b: _iou(box, b), default=None)
+            if best is not None and _iou(box, best) >= min_iou:
+                free.remove(best)
+                hits += 1
+        found_total += len(found)
+        truth_total += len(truth)
+    return {
+        "images": len(samples),
+        "ms_per_image": elapsed * 1000 / max(len(samples), 1),
+        "recall": hits / truth_total if truth_total else None,
+        "precision": hits / found_total if found_total else None,
+    }
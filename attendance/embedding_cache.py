@@ -0,0 +1,115 @@
+# attendance/embedding_cache.py
+
+import hashlib
+import io
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .embedding_store import _atomic_write
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, as hex."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by the content hash of their source image.
+
+    Entries live under root/<namespace>/<aa>/<digest>.npy, where the
+    namespace names the model, its version and the embedding method, so a
+    model upgrade never serves stale vectors. An unchanged image (same
+    bytes, even re-uploaded under another name) is a hit and skips
+    inference.
+    """
+
+    _counter_lock = threading.Lock()
+
+    def __init__(self, root, namespace):
+        self.root = Path(root)
+        self.namespace = namespace
+        self.dir = self.root / namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return self.dir / digest[:2] / f"{digest}.npy"
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, digest):
+        try:
+            embedding = np.load(str(self._path(digest)))
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        self._count(True)
+        return embedding
+
+    def put(self, digest, embedding):
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buf = io.BytesIO()
+        np.save(buf, np.asarray(embedding, dtype=np.float32))
+        _atomic_write(path, buf.getvalue())
+
+    def get_or_compute(self, image_path, compute):
+        """Cached embedding of an image file, or compute(image_path) stored for next time."""
+        digest = file_digest(image_path)
+        embedding = self.get(digest)
+        if embedding is None:
+            embedding = compute(image_path)
+            self.put(digest, embedding)
+        return embedding
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+    def digests(self):
+        if not self.dir.exists():
+            return []
+        return [p.stem for p in self.dir.glob("*/*.npy")]
+
+
+def gc_cache(root, namespaces, keep, dry_run=False):
+    """
+    Delete cache entries whose digest is not in `keep`, and every namespace
+    not listed (other models or versions). Returns (entries removed, bytes freed).
+    """
+    root = Path(root)
+    removed = freed = 0
+    if not root.exists():
+        return removed, freed
+    for ns_dir in root.iterdir():
+        if not ns_dir.is_dir():
+            continue
+        current = ns_dir.name in namespaces
+        for path in ns_dir.glob("*/*.npy"):
+            if current and path.stem in keep:
+                continue
+            removed += 1
+            freed += path.stat().st_size
+            if not dry_run:
+                path.unlink()
+        if not current and not dry_run:
+            shutil.rmtree(ns_dir, ignore_errors=True)
+    return removed, freed
@@ -0,0 +1,315 @@
+# attendance/embedding_store.py
+
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+COMPACT_MIN_DEAD_ROWS = 1024
+
+
+class _FileLock:
+    """
+    Cross-process writer lock based on an O_EXCL lock file.
+    A lock older than `stale_after` seconds is assumed abandoned and broken.
+    """
+
+    def __init__(self, path, timeout=30.0, stale_after=60.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not lock embedding store: {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class EmbeddingStore:
+    """
+    Packed, append-only embedding store for one model.
+
+    Layout inside `root`:
+        header.json          model name, dimension, row count, version, generation
+        vectors.<gen>.f32    contiguous float32 rows, opened with np.memmap
+        index.<gen>.npy      student id per row, -1 for superseded rows
+
+    Writers append a row and then atomically replace the index and the
+    header, so readers only ever see complete rows. A student owns one or
+    a few rows (prototypes); updating a student appends the new rows and
+    retires the old ones; compact() rewrites the live rows into a new
+    generation.
+    """
+
+    def __init__(self, root, model_name, dim=None):
+        self.root = Path(root)
+        self.model_name = model_name
+        self.dim = dim
+        self.header_path = self.root / "header.json"
+
+    # ---------- reading ----------
+
+    def read_header(self):
+        try:
+            with open(self.header_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _paths(self, generation):
+        return (self.root / f"vectors.{generation}.f32",
+                self.root / f"index.{generation}.npy")
+
+    def _open(self, header):
+        vec_path, idx_path = self._paths(header["generation"])
+        rows, dim = header["rows"], header["dim"]
+        # Index is replaced before the header, so it always covers `rows`.
+        index = np.load(str(idx_path))[:rows]
+        if rows == 0:
+            return index, np.empty((0, dim), dtype=np.float32)
+        vectors = np.memmap(str(vec_path), dtype=np.float32, mode="r", shape=(rows, dim))
+        return index, vectors
+
+    def _snapshot(self):
+        """
+        Return (header, index, vectors) for a consistent view of the store,
+        or None if it is empty. Retries if a compaction swapped files underneath.
+        """
+        for _ in range(5):
+            header = self.read_header()
+            if header is None:
+                return None
+            self._check_model(header)
+            try:
+                return (header,) + self._open(header)
+            except FileNotFoundError:
+                continue
+        raise RuntimeError(f"Embedding store at {self.root} keeps changing; giving up")
+
+    def version(self):
+        header = self.read_header()
+        return header["version"] if header else 0
+
+    def live(self):
+        """
+        Return (ids, vectors) for every current embedding.
+        `vectors` is an in-memory copy of the live rows of the memmap.
+        """
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32)
+
+        _, index, vectors = snapshot
+        live = index >= 0
+        return index[live], np.array(vectors[live], dtype=np.float32)
+
+    def ids(self):
+        """Ids of the students with embeddings; no vectors are read."""
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return np.empty(0, dtype=np.int64)
+        index = snapshot[1]
+        return np.unique(index[index >= 0])
+
+    def changes_since(self, state=None):
+        """
+        Diff the store against `state`, as returned by an earlier call.
+
+        Returns (state, ids, vectors, deleted, full). Without a usable
+        state (first call, or a compaction since), `full` is True and ids
+        and vectors hold every live embedding. Otherwise they hold only
+        the rows written since, and `deleted` the students removed since;
+        only the new rows are read from disk.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32))
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return None, *empty, np.empty(0, dtype=np.int64), state is not None
+
+        header, index, vectors = snapshot
+        new_state = {
+            "generation": header["generation"],
+            "version": header["version"],
+            "index": np.array(index),
+        }
+        if state is None or state["generation"] != header["generation"]:
+            live = index >= 0
+            return new_state, index[live], np.array(vectors[live], dtype=np.float32), empty[0], True
+        if state["version"] == header["version"]:
+            return state, *empty, empty[0], False
+
+        old = state["index"]
+        start = len(old)
+        # Rows appended since; some may already be superseded again.
+        appended = index[start:]
+        fresh = appended >= 0
+        ids = appended[fresh]
+        new_vectors = np.array(vectors[start:][fresh], dtype=np.float32)
+        # A retired row without a fresh replacement means the student was deleted.
+        retired = old[(old >= 0) & (index[:start] < 0)]
+        deleted = np.setdiff1d(retired, ids)
+        return new_state, ids, new_vectors, deleted, False
+
+    def get(self, student_id):
+        """A student's live rows as a (p, dim) matrix, or None."""
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return None
+        _, index, vectors = snapshot
+        rows = np.flatnonzero(index == student_id)
+        if len(rows) == 0:
+            return None
+        return np.array(vectors[rows], dtype=np.float32)
+
+    def __len__(self):
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return 0
+        return int(np.count_nonzero(snapshot[1] >= 0))
+
+    def _check_model(self, header):
+        if header["model_name"] != self.model_name:
+            raise ValueError(
+                f"Embedding store at {self.root} holds {header['model_name']} "
+                f"embeddings, expected {self.model_name}"
+            )
+
+    # ---------- writing ----------
+
+    def _lock(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        return _FileLock(self.root / "store.lock")
+
+    def _load_for_write(self, dim):
+        header = self.read_header()
+        if header is None:
+            header = {
+                "model_name": self.model_name,
+                "dim": int(dim),
+                "rows": 0,
+                "version": 0,
+                "generation": 0,
+            }
+            index = np.empty(0, dtype=np.int64)
+        else:
+            self._check_model(header)
+            _, idx_path = self._paths(header["generation"])
+            index = np.load(str(idx_path))[:header["rows"]]
+        if header["dim"] != dim:
+            raise ValueError(f"Embedding has {dim} dims, store expects {header['dim']}")
+        return header, index
+
+    def _commit(self, header, index):
+        _, idx_path = self._paths(header["generation"])
+        buf = io.BytesIO()
+        np.save(buf, index)
+        _atomic_write(idx_path, buf.getvalue())
+        header["rows"] = int(len(index))
+        header["version"] += 1
+        _atomic_write(self.header_path, json.dumps(header).encode())
+
+    def put_many(self, student_ids, embeddings):
+        """
+        Append or update several students in one atomic write. All rows
+        given for a student (e.g. their prototypes) together replace every
+        row that student had before.
+        """
+        if len(student_ids) == 0:
+            return
+        ids = np.asarray(student_ids, dtype=np.int64)
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+
+        with self._lock():
+            header, index = self._load_for_write(embeddings.shape[1])
+            index = np.where(np.isin(index, ids), -1, index)
+
+            vec_path, _ = self._paths(header["generation"])
+            mode = "r+b" if vec_path.exists() else "wb"
+            with open(vec_path, mode) as f:
+                # Drop any torn tail left by an interrupted writer.
+                f.seek(header["rows"] * header["dim"] * 4)
+                f.write(embeddings.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+            index = np.concatenate([index, ids])
+            self._commit(header, index)
+
+        # Updates leave dead rows behind; rewrite once they dominate the file.
+        dead = int(np.count_nonzero(index < 0))
+        if dead > COMPACT_MIN_DEAD_ROWS and dead * 2 > len(index):
+            self.compact()
+
+    def put(self, student_id, embedding):
+        """Store one vector, or a (p, dim) matrix of prototypes, for a student."""
+        embedding = np.atleast_2d(np.asarray(embedding, dtype=np.float32))
+        self.put_many([student_id] * len(embedding), embedding)
+
+    def delete(self, student_id):
+        with self._lock():
+            header = self.read_header()
+            if header is None:
+                return False
+            header, index = self._load_for_write(header["dim"])
+            if not np.any(index == student_id):
+                return False
+            self._commit(header, np.where(index == student_id, -1, index))
+            return True
+
+    def compact(self):
+        """Rewrite only the live rows into a new generation of files."""
+        with self._lock():
+            header = self.read_header()
+            if header is None:
+                return
+            old_gen = header["generation"]
+            index, vectors = self._open(header)
+            live = index >= 0
+
+            header["generation"] = old_gen + 1
+            vec_path, _ = self._paths(header["generation"])
+            _atomic_write(vec_path, np.ascontiguousarray(vectors[live]).tobytes())
+            del vectors
+            self._commit(header, index[live])
+
+            for path in self._paths(old_gen):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by a reader (Windows); harmless leftover.
+                    pass
+
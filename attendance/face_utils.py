@@ -4,16 +4,57 @@ import os
 from pathlib import Path
 import numpy as np
 import cv2
+import threading
+import time
 import traceback
+from collections import namedtuple
 
 from django.conf import settings
+import deepface
 from deepface import DeepFace
 from students.models import Student
 
+from .ann import IVFIndex
+from .embedding_cache import EmbeddingCache
+from .embedding_store import EmbeddingStore
+from .detection import DETECTOR, make_detector
+from .gallery import Gallery, StudentMeta, build_prototypes
+
 
 ENC_DIR = Path(settings.MEDIA_ROOT) / "encodings_deepface"
 MODEL_NAME = "Facenet"
 DIST_THRESHOLD = 0.65
+# Maximum number of face crops sent through the model in one forward pass.
+EMBED_BATCH_SIZE = getattr(settings, "FACE_EMBED_BATCH_SIZE", 32)
+STORE_DIR = ENC_DIR / f"store_{MODEL_NAME}"
+# Embeddings of enrollment images keyed by content hash; set False to always recompute.
+EMBED_CACHE = getattr(settings, "FACE_EMBED_CACHE", True)
+CACHE_DIR = ENC_DIR / "cache"
+# Approximate matching for very large galleries: None (exact) or "ivf".
+ANN_INDEX = getattr(settings, "FACE_ANN_INDEX", None)
+ANN_NLIST = getattr(settings, "FACE_ANN_NLIST", None)
+# Clusters scanned per query; higher means better recall, lower means faster.
+ANN_NPROBE = getattr(settings, "FACE_ANN_NPROBE", 8)
+# Galleries smaller than this are always matched exactly.
+ANN_MIN_SIZE = getattr(settings, "FACE_ANN_MIN_SIZE", 20000)
+# Retry faces that miss the classroom roster against the whole school.
+GLOBAL_FALLBACK = getattr(settings, "ATTENDANCE_GLOBAL_FALLBACK", False)
+# Prototype vectors kept per student: the mean of their images plus medoids.
+MAX_PROTOTYPES = getattr(settings, "FACE_MAX_PROTOTYPES", 3)
+# Tracked faces are re-embedded every N frames to re-verify their identity...
+TRACK_REVERIFY_EVERY = getattr(settings, "FACE_TRACK_REVERIFY_EVERY", 30)
+# ...or every N frames while they are unknown or close to the threshold.
+TRACK_RETRY_UNCERTAIN_EVERY = getattr(settings, "FACE_TRACK_RETRY_UNCERTAIN_EVERY", 5)
+# Seconds between checks of the embedding store for enrollments made by other processes.
+GALLERY_SYNC_INTERVAL = getattr(settings, "FACE_GALLERY_SYNC_INTERVAL", 1.0)
+# Seconds between reloads of student names and classrooms changed by other processes.
+META_REFRESH_INTERVAL = getattr(settings, "FACE_META_REFRESH_INTERVAL", 60.0)
+# In-memory gallery storage: "float32", "float16" (half the memory) or "int8" (a quarter).
+GALLERY_DTYPE = getattr(settings, "FACE_GALLERY_DTYPE", "float32")
+
+
+# One recognized (or not) face. student_id is None for unknown faces.
+FaceResult = namedtuple("FaceResult", "box student_id name distance")
 
 
 def _ensure_dir():
@@ -23,138 +64,646 @@ def _ensure_dir():
     print(f"[DEBUG] Is writable: {os.access(ENC_DIR, os.W_OK)}")
 
 
-def build_embedding_for_student(student):
+def get_store():
     """
-    Build embedding for a student. Print debug info.
+    Packed embedding store for the current model.
     """
-    if not student.photo:
-        print(f"[ERROR] Student {student.id} has no photo")
-        return
+    return EmbeddingStore(STORE_DIR, MODEL_NAME)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# "represent" is DeepFace.represent on a whole photo (embed_image_file),
+# "batched" the detector crop + batched forward pass of bulk_enroll.
+CACHE_METHODS = ("represent", "batched")
+
+
+def get_embedding_cache(method="represent"):
+    """
+    Process-wide content-hash cache for one embedding method. The
+    namespace pins the model and DeepFace version.
+    """
+    with _caches_lock:
+        cache = _caches.get(method)
+        if cache is None:
+            namespace = f"{MODEL_NAME}-deepface{deepface.__version__}-{method}"
+            cache = _caches[method] = EmbeddingCache(CACHE_DIR, namespace)
+        return cache
+
+
+def embed_image_file(img_path):
+    """
+    Embed the face in one image file with DeepFace.represent, served from
+    the embedding cache when the same image bytes were embedded before.
+    Raises ValueError with the reason on failure.
+    """
+    if not EMBED_CACHE:
+        return _represent(img_path)
+    try:
+        return get_embedding_cache().get_or_compute(img_path, _represent)
+    except OSError as e:
+        raise ValueError(f"{type(e).__name__}: {e}") from e
 
-    _ensure_dir()
-    
-    # Convert to absolute string path (Windows compatibility)
-    img_path = str(student.photo.path)
-    print(f"[DEBUG] Building embedding for student {student.id}: {img_path}")
-    print(f"[DEBUG] File exists: {os.path.exists(img_path)}")
 
+def _represent(img_path):
     try:
         # DeepFace.represent returns list of dicts
         objs = DeepFace.represent(
-            img_path=img_path,
+            img_path=str(img_path),
             model_name=MODEL_NAME,
             enforce_detection=False
         )
-        
-        if not objs:
-            print(f"[ERROR] No embedding generated for student {student.id}")
-            return
-        
-        embedding = np.array(objs[0]["embedding"], dtype=np.float32)
-        print(f"[DEBUG] Embedding shape: {embedding.shape}")
-
-        enc_file = ENC_DIR / f"student_{student.id}_{MODEL_NAME}.npy"
-        np.save(str(enc_file), embedding)
-        print(f"[SUCCESS] Saved encoding to: {enc_file}")
-
     except Exception as e:
-        print(f"[ERROR] Exception for student {student.id}: {str(e)}")
-        traceback.print_exc()
+        raise ValueError(f"{type(e).__name__}: {e}") from e
+
+    if not objs:
+        raise ValueError("No face found in photo")
+    return np.array(objs[0]["embedding"], dtype=np.float32)
+
+
+def build_embedding_for_student(student):
+    """
+    Build embeddings for a student's photo and all their extra images
+    (StudentImage) and store them as prototypes. Print debug info.
+    Returns the prototypes; raises ValueError with the reason when no
+    image could be embedded.
+    """
+    # Convert to absolute string paths (Windows compatibility)
+    paths = [str(student.photo.path)] if student.photo else []
+    paths += [str(img.image.path) for img in student.images.all() if img.image]
+    if not paths:
+        print(f"[ERROR] Student {student.id} has no photo")
+        raise ValueError("Student has no photo")
+
+    _ensure_dir()
+
+    embeddings, errors = [], []
+    for img_path in paths:
+        print(f"[DEBUG] Building embedding for student {student.id}: {img_path}")
+        print(f"[DEBUG] File exists: {os.path.exists(img_path)}")
+        try:
+            embeddings.append(embed_image_file(img_path))
+        except ValueError as e:
+            print(f"[ERROR] Exception for student {student.id}: {str(e)}")
+            traceback.print_exc()
+            errors.append(f"{os.path.basename(img_path)}: {e}")
+
+    if not embeddings:
+        raise ValueError("; ".join(errors))
+
+    if EMBED_CACHE:
+        print(f"[CACHE] {get_embedding_cache().stats()}")
+    prototypes = build_prototypes(np.stack(embeddings), MAX_PROTOTYPES)
+    print(f"[DEBUG] {len(embeddings)} images -> {len(prototypes)} prototypes of {prototypes.shape[1]} dims")
+
+    get_store().put(student.id, prototypes)
+    print(f"[SUCCESS] Saved encoding for student {student.id} to: {STORE_DIR}")
+    update_live_gallery(student.id, prototypes, classroom_id=student.classroom_id,
+                        meta=student_meta(student))
+    return prototypes
+
+
+def make_ann_index():
+    """
+    Build the configured approximate index, or None for exact matching.
+    """
+    if ANN_INDEX is None:
+        return None
+    if ANN_INDEX == "ivf":
+        return IVFIndex(nlist=ANN_NLIST, nprobe=ANN_NPROBE)
+    raise ValueError(f"Unknown FACE_ANN_INDEX: {ANN_INDEX}")
 
 
 def load_known_faces():
     """
-    Load all stored embeddings.
+    Load all stored embeddings from the packed store.
+    Returns an (n, dim) float32 matrix and the matching student ids.
     """
     _ensure_dir()
-    known_encodings = []
-    known_ids = []
-
-    for student in Student.objects.all():
-        enc_file = ENC_DIR / f"student_{student.id}_{MODEL_NAME}.npy"
-        if enc_file.exists():
-            emb = np.load(str(enc_file))
-            known_encodings.append(emb)
-            known_ids.append(student.id)
-            print(f"[DEBUG] Loaded encoding for student {student.id}")
-
-    print(f"[INFO] Loaded {len(known_encodings)} known encodings")
+    return _existing_only(*get_store().live())
+
+
+def student_meta(student):
+    return StudentMeta(student.id, student.roll_no, student.name, student.classroom_id)
+
+
+def load_student_meta(ids=None):
+    """StudentMeta of every student, or only of `ids`, in one query."""
+    students = Student.objects.all()
+    if ids is not None:
+        students = students.filter(id__in=list(ids))
+    return {
+        row[0]: StudentMeta(*row)
+        for row in students.values_list("id", "roll_no", "name", "classroom_id")
+    }
+
+
+def _existing_only(ids, vectors, existing=None):
+    # Skip rows of students deleted without going through student_delete.
+    if existing is None:
+        existing = set(Student.objects.values_list("id", flat=True))
+    keep = np.array([sid in existing for sid in ids.tolist()], dtype=bool)
+    known_encodings, known_ids = vectors[keep], ids[keep].tolist()
+
+    print(f"[INFO] Loaded {len(known_ids)} known encodings")
     return known_encodings, known_ids
 
 
-def recognize_from_frame(frame, known_encodings, known_ids):
+def preprocess_faces(frame, boxes, target_size):
     """
-    Detect faces, recognize, annotate with GREEN for recognized and RED for unknown.
+    Crop every box out of a BGR frame, letterbox it to the model input size
+    and scale pixels to [0, 1]. Returns an (n, h, w, 3) float32 array.
+    """
+    target_h, target_w = target_size
+    batch = np.zeros((len(boxes), target_h, target_w, 3), dtype=np.float32)
+
+    for i, (x, y, w, h) in enumerate(boxes):
+        face = frame[max(y, 0):y + h, max(x, 0):x + w]
+        if face.size == 0:
+            continue
+
+        # Same letterboxing as DeepFace.represent, so live embeddings stay
+        # comparable with the ones built from enrollment photos.
+        factor = min(target_h / face.shape[0], target_w / face.shape[1])
+        new_w = max(1, int(face.shape[1] * factor))
+        new_h = max(1, int(face.shape[0] * factor))
+        face = cv2.resize(face, (new_w, new_h))
+
+        top = (target_h - new_h) // 2
+        left = (target_w - new_w) // 2
+        batch[i, top:top + new_h, left:left + new_w] = face
+
+    batch /= 255.0
+    return batch
+
+
+def embed_faces(frame, boxes, batch_size=EMBED_BATCH_SIZE, model=None):
+    """
+    Embed all detected faces of a frame in batched forward passes.
+    Returns an (n, dim) float32 matrix, one row per box.
+    """
+    if model is None:
+        model = DeepFace.build_model(MODEL_NAME)
+    if len(boxes) == 0:
+        return np.empty((0, model.output_shape), dtype=np.float32)
+
+    faces = preprocess_faces(frame, boxes, model.input_shape)
+    embeddings = []
+    for start in range(0, len(faces), batch_size):
+        out = model.forward(faces[start:start + batch_size])
+        embeddings.append(np.asarray(out, dtype=np.float32).reshape(-1, model.output_shape))
+
+    return np.concatenate(embeddings, axis=0)
+
+
+def _draw_box(frame, box, label, color, text_color):
+    x, y, w, h = box
+    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+    cv2.rectangle(frame, (x, y + h - 22), (x + w, y + h), color, cv2.FILLED)
+    cv2.putText(frame, label, (x + 4, y + h - 6),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class _Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = np.array(box, dtype=np.float32)
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.student_id = None
+        self.name = "Unknown"
+        self.distance = None
+        self.last_embedded = None
+        self.misses = 0
+
+    def predict(self):
+        self.box[:2] += self.velocity
+
+    def correct(self, box, alpha=0.6, beta=0.2):
+        # alpha-beta filter: a fixed-gain Kalman update on position and velocity
+        residual = np.asarray(box, dtype=np.float32) - self.box
+        self.box += alpha * residual
+        self.velocity += beta * residual[:2]
+        self.misses = 0
+
+
+class FaceTracker:
+    """
+    IoU tracker that sits between detection and embedding.
+
+    Boxes are associated with existing tracks after a constant-velocity
+    prediction step. A track is embedded when it first appears, then only
+    re-verified every `reverify_every` frames, or every
+    `retry_uncertain_every` frames while it is unknown or its distance is
+    within `uncertain_margin` of the match threshold.
     """
-    recognized_ids = set()
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-    cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    detector = cv2.CascadeClassifier(cascade_path)
-    faces = detector.detectMultiScale(rgb, scaleFactor=1.2, minNeighbors=5)
+    def __init__(self, iou_threshold=0.3, max_misses=10,
+                 reverify_every=TRACK_REVERIFY_EVERY,
+                 retry_uncertain_every=TRACK_RETRY_UNCERTAIN_EVERY,
+                 uncertain_margin=0.1):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.reverify_every = reverify_every
+        self.retry_uncertain_every = retry_uncertain_every
+        self.uncertain_margin = uncertain_margin
 
-    for (x, y, w, h) in faces:
-        face_img = rgb[y:y + h, x:x + w]
+        self.tracks = []
+        self.frame_index = 0
+        self._next_id = 1
+        self.faces_seen = 0
+        self.embeddings_computed = 0
+
+    def update(self, boxes):
+        """Advance one frame. Returns the track for each detected box, in order."""
+        self.frame_index += 1
+        for track in self.tracks:
+            track.predict()
+
+        # Greedy association on IoU, best pairs first.
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, box in enumerate(boxes):
+                iou = _iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, ti, bi))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for _, ti, bi in pairs:
+            if ti in used or assigned[bi] is not None:
+                continue
+            used.add(ti)
+            self.tracks[ti].correct(boxes[bi])
+            assigned[bi] = self.tracks[ti]
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                track = _Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[bi] = track
+
+        self.faces_seen += len(boxes)
+        return assigned
+
+    def needs_embedding(self, track, threshold):
+        if track.last_embedded is None:
+            return True
+        age = self.frame_index - track.last_embedded
+        uncertain = (
+            track.student_id is None
+            or track.distance is None
+            or track.distance > threshold - self.uncertain_margin
+        )
+        if uncertain:
+            return age >= self.retry_uncertain_every
+        return age >= self.reverify_every
+
+    def assign(self, track, student_id, name, distance):
+        track.student_id = student_id
+        track.name = name
+        track.distance = distance
+        track.last_embedded = self.frame_index
+        self.embeddings_computed += 1
+
+    def stats(self):
+        return {
+            "faces_seen": self.faces_seen,
+            "embeddings_computed": self.embeddings_computed,
+            "embeddings_saved": self.faces_seen - self.embeddings_computed,
+            "active_tracks": len(self.tracks),
+        }
+
+
+class RecognitionEngine:
+    """
+    Long-lived recognizer. The face detector, the Facenet model and the
+    gallery are loaded once and reused for every frame of every stream.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, threshold=DIST_THRESHOLD,
+                 batch_size=EMBED_BATCH_SIZE, global_fallback=GLOBAL_FALLBACK):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.global_fallback = global_fallback
+
+        # classroom id -> Gallery holding only that classroom's roster
+        self._partitions = {}
+        self._partitions_gen = 0
+        self._partitions_lock = threading.Lock()
+        self._store_state = None
+        self._next_sync = 0.0
+        self._next_meta_refresh = 0.0
+        self._sync_lock = threading.Lock()
+
+        self.detector = make_detector(DETECTOR)
+        # Detectors of cameras that use another backend, built on first use.
+        self._detectors = {self.detector.name: self.detector}
+        self.model = DeepFace.build_model(model_name)
+        self.gallery = Gallery(dtype=GALLERY_DTYPE)
+        self.reload_gallery()
+        self._warm_up()
+
+    def _warm_up(self):
+        """Run one dummy detection and inference so the first real frame is not slower."""
+        h, w = self.model.input_shape
+        self.detector.detect(np.zeros((240, 320, 3), dtype=np.uint8))
+        self.model.forward(np.zeros((1, h, w, 3), dtype=np.float32))
+        print(f"[INFO] Recognition engine ready ({self.model_name})")
+
+    def reload_gallery(self):
+        """Re-read every embedding. Normally only needed once; see sync_gallery()."""
+        _ensure_dir()
+        state, ids, vectors, _, _ = get_store().changes_since(None)
+        self._set_gallery(state, ids, vectors)
+
+    def _set_gallery(self, state, ids, vectors):
+        # One query for the metadata of every student, which also drops deleted ones.
+        meta = load_student_meta()
+        self.gallery = Gallery.from_arrays(
+            *_existing_only(ids, vectors, existing=meta), ann=make_ann_index(),
+            ann_min_size=ANN_MIN_SIZE, dtype=GALLERY_DTYPE, meta=meta,
+        )
+        self._store_state = state
+        self._next_meta_refresh = time.monotonic() + META_REFRESH_INTERVAL
+        with self._partitions_lock:
+            self._partitions.clear()
+            self._partitions_gen += 1
+
+    def sync_gallery(self, force=False):
+        """
+        Apply enrollments made since the last sync, by this or any other
+        process, using the embedding store's version stamp. Only changed
+        rows are read and patched into the live gallery, so recognition
+        keeps running; a store compaction falls back to a full reload.
+        Checks at most every GALLERY_SYNC_INTERVAL seconds unless forced.
+        Student names and classrooms are reloaded every META_REFRESH_INTERVAL
+        seconds, for edits made in other processes.
+        """
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return False
+        # Another stream is already syncing; carry on with the current gallery.
+        if not self._sync_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_sync = now + GALLERY_SYNC_INTERVAL
+            if now >= self._next_meta_refresh:
+                self.refresh_meta()
+            store = get_store()
+            known = self._store_state["version"] if self._store_state else 0
+            if store.version() == known:
+                return False
+
+            state, ids, vectors, deleted, full = store.changes_since(self._store_state)
+            if full:
+                self._set_gallery(state, ids, vectors)
+                return True
+
+            meta = load_student_meta(set(ids.tolist()))
+            for sid in deleted.tolist():
+                self.gallery.remove(sid)
+                self.invalidate_partitions(student_id=sid)
+            for sid in meta:
+                # All fresh rows of a student are their new prototypes.
+                self.gallery.add(sid, vectors[ids == sid], meta=meta[sid])
+                self.invalidate_partitions(meta[sid].classroom_id, student_id=sid)
+            self._store_state = state
+            print(f"[INFO] Gallery synced: {len(meta)} enrolled, {len(deleted)} removed")
+            return True
+        finally:
+            self._sync_lock.release()
+
+    def refresh_meta(self):
+        """Reload every student's metadata in one query and apply what changed."""
+        self._next_meta_refresh = time.monotonic() + META_REFRESH_INTERVAL
+        changed = 0
+        for sid, meta in load_student_meta().items():
+            old = self.gallery.meta(sid)
+            if old is not None and old != meta:
+                self.gallery.set_meta(meta)
+                changed += 1
+        if changed:
+            # Rosters and the metadata copied into them may both be stale.
+            self.invalidate_partitions(*list(self._partitions))
+            print(f"[INFO] Student metadata refreshed: {changed} changed")
+
+    def gallery_for(self, classroom_id):
+        """
+        Gallery restricted to one classroom's roster, built once and cached
+        until a student joins, leaves or is re-enrolled in that classroom.
+        """
+        part = self._partitions.get(classroom_id)
+        if part is None:
+            gen = self._partitions_gen
+            part = self.gallery.subset(self.gallery.students_in(classroom_id))
+            with self._partitions_lock:
+                # Don't cache a roster that was invalidated while we built it.
+                if gen == self._partitions_gen:
+                    self._partitions[classroom_id] = part
+            print(f"[INFO] Classroom {classroom_id} gallery: {len(part)} students")
+        return part
+
+    def invalidate_partitions(self, *classroom_ids, student_id=None):
+        """Drop cached classroom galleries; they are rebuilt on next use."""
+        with self._partitions_lock:
+            self._partitions_gen += 1
+            for cid in classroom_ids:
+                self._partitions.pop(cid, None)
+            if student_id is not None:
+                for cid, part in list(self._partitions.items()):
+                    if student_id in part:
+                        del self._partitions[cid]
+
+    def _match(self, embeddings, gallery, fallback=None):
+        best_ids, best_dists = gallery.match(embeddings, k=1)
+        best_ids, best_dists = best_ids[:, 0], best_dists[:, 0]
+
+        if fallback is not None:
+            missed = np.flatnonzero(best_dists >= self.threshold)
+            if len(missed):
+                fb_ids, fb_dists = fallback.match(embeddings[missed], k=1)
+                better = fb_dists[:, 0] < best_dists[missed]
+                best_ids[missed[better]] = fb_ids[better, 0]
+                best_dists[missed[better]] = fb_dists[better, 0]
+
+        return best_ids, best_dists
+
+    def detect(self, frame, options=None):
+        """Face boxes in full-resolution pixels; `options` are a camera's DetectOptions."""
+        detector = self.detector
+        if options is not None and options.detector and options.detector != detector.name:
+            detector = self._detectors.get(options.detector)
+            if detector is None:
+                detector = self._detectors[options.detector] = make_detector(options.detector)
+        return detector.detect(frame, options)
+
+    def embed(self, frame, boxes):
+        return embed_faces(frame, boxes, batch_size=self.batch_size, model=self.model)
+
+    def _lookup_name(self, student_id, gallery):
+        meta = gallery.meta(student_id) or self.gallery.meta(student_id)
+        if meta is not None:
+            return meta.name
+        # Only galleries built by callers without metadata get here.
+        return Student.objects.filter(id=student_id).values_list("name", flat=True).first() or "Unknown"
+
+    def recognize(self, frame, classroom_id=None, gallery=None, tracker=None, detect_options=None):
+        """
+        Detect and recognize faces without drawing. Returns one FaceResult per face.
+        Matches against the classroom roster when `classroom_id` is given,
+        otherwise against the passed gallery or the whole school. With a
+        tracker, only new or due-for-reverification faces are embedded.
+        """
+        self.sync_gallery()
+        fallback = None
+        if gallery is None and classroom_id is not None:
+            gallery = self.gallery_for(classroom_id)
+            if self.global_fallback:
+                fallback = self.gallery
+        elif gallery is None:
+            gallery = self.gallery
+
+        faces = self.detect(frame, detect_options)
+        if tracker is not None:
+            tracks = tracker.update(faces)
+            todo = [i for i, t in enumerate(tracks) if tracker.needs_embedding(t, self.threshold)]
+        else:
+            tracks = None
+            todo = list(range(len(faces)))
 
         try:
-            objs = DeepFace.represent(
-                img_path=face_img,
-                model_name=MODEL_NAME,
-                enforce_detection=False
-            )
+            embeddings = self.embed(frame, [faces[i] for i in todo])
         except Exception as e:
-            print(f"[WARN] DeepFace error on frame face: {str(e)}")
-            # Draw RED box for error
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-            cv2.rectangle(frame, (x, y + h - 22), (x + w, y + h), (0, 0, 255), cv2.FILLED)
-            cv2.putText(frame, "Error", (x + 4, y + h - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            continue
+            print(f"[WARN] DeepFace error on frame faces: {str(e)}")
+            return [FaceResult(tuple(box), None, "Error", None) for box in faces]
+
+        # One matrix multiply matches every face that needs it.
+        best_ids, best_dists = self._match(embeddings, gallery, fallback)
+
+        matched = {}
+        for i, sid, best_dist in zip(todo, best_ids, best_dists):
+            student_id, name, dist = None, "Unknown", None
+            if sid >= 0:
+                dist = float(best_dist)
+                print(f"[MATCH] Best distance: {dist:.4f}, Threshold: {self.threshold}")
+
+                if dist < self.threshold:
+                    student_id = int(sid)
+                    name = self._lookup_name(student_id, gallery)
+                    print(f"[RECOGNIZED] {name} (distance: {dist:.4f})")
+
+            if tracks is not None:
+                tracker.assign(tracks[i], student_id, name, dist)
+            matched[i] = (student_id, name, dist)
+
+        results = []
+        for i, box in enumerate(faces):
+            if i in matched:
+                student_id, name, dist = matched[i]
+            else:
+                # Carried over from the track's last verification.
+                student_id, name, dist = tracks[i].student_id, tracks[i].name, tracks[i].distance
+            results.append(FaceResult(tuple(box), student_id, name, dist))
+        return results
+
+    def process(self, frame, classroom_id=None, gallery=None, tracker=None):
+        """
+        Detect faces, recognize, annotate with GREEN for recognized and RED for unknown.
+        """
+        results = self.recognize(frame, classroom_id=classroom_id, gallery=gallery, tracker=tracker)
+        annotate_frame(frame, results)
+        recognized_ids = {r.student_id for r in results if r.student_id is not None}
+        return recognized_ids, frame
 
-        if not objs:
-            # Draw RED box for no embedding
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-            cv2.rectangle(frame, (x, y + h - 22), (x + w, y + h), (0, 0, 255), cv2.FILLED)
-            cv2.putText(frame, "No Face", (x + 4, y + h - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            continue
 
-        emb = np.array(objs[0]["embedding"], dtype=np.float32)
-        name = "Unknown"
-        is_recognized = False
-
-        if known_encodings:
-            enc_mat = np.stack(known_encodings, axis=0)
-            num = np.sum(enc_mat * emb, axis=1)
-            den = (np.linalg.norm(enc_mat, axis=1) * np.linalg.norm(emb) + 1e-8)
-            cos_sim = num / den
-            cos_dist = 1.0 - cos_sim
-
-            best_idx = int(np.argmin(cos_dist))
-            best_dist = float(cos_dist[best_idx])
-
-            print(f"[MATCH] Best distance: {best_dist:.4f}, Threshold: {DIST_THRESHOLD}")
-
-            if best_dist < DIST_THRESHOLD:
-                sid = known_ids[best_idx]
-                recognized_ids.add(sid)
-                is_recognized = True
-                student = Student.objects.get(id=sid)
-                name = student.name
-                print(f"[RECOGNIZED] {name} (distance: {best_dist:.4f})")
-
-        # Draw box: GREEN if recognized, RED if unknown
-        if is_recognized:
-            # GREEN box + black text
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.rectangle(frame, (x, y + h - 22), (x + w, y + h), (0, 255, 0), cv2.FILLED)
-            cv2.putText(frame, name, (x + 4, y + h - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+def annotate_frame(frame, results):
+    """
+    Draw boxes: GREEN + black text if recognized, RED + white label otherwise.
+    """
+    for result in results:
+        if result.student_id is not None:
+            _draw_box(frame, result.box, result.name, (0, 255, 0), (0, 0, 0))
         else:
-            # RED box + white text for "Unknown"
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-            cv2.rectangle(frame, (x, y + h - 22), (x + w, y + h), (0, 0, 255), cv2.FILLED)
-            cv2.putText(frame, "Unknown", (x + 4, y + h - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            _draw_box(frame, result.box, result.name, (0, 0, 255), (255, 255, 255))
+    return frame
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide RecognitionEngine, creating it on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RecognitionEngine()
+    return _engine
+
 
-    return recognized_ids, frame
\ No newline at end of file
+def recognize_from_frame(frame, known_encodings, known_ids):
+    """
+    Detect faces, recognize, annotate with GREEN for recognized and RED for unknown.
+    Kept for callers that hold their own gallery; runs on the shared engine.
+    """
+    gallery = Gallery.from_arrays(known_encodings, known_ids)
+    return get_engine().process(frame, gallery=gallery)
+
+
+def update_live_gallery(student_id, embedding=None, classroom_id=None, meta=None):
+    """
+    Apply an enrollment change to the running engine, if this process has one.
+    `embedding` is one vector or a student's prototypes; passing none removes the student.
+    """
+    if _engine is None:
+        return
+    if embedding is None:
+        _engine.gallery.remove(student_id)
+    else:
+        _engine.gallery.add(student_id, embedding, meta=meta)
+    _engine.invalidate_partitions(
+        *([classroom_id] if classroom_id is not None else []), student_id=student_id
+    )
+
+
+def update_live_student(student):
+    """
+    Called when a student's name, roll number or classroom changes, so the
+    running engine labels them correctly without a query per face.
+    """
+    if _engine is None:
+        return
+    _engine.gallery.set_meta(student_meta(student))
+    _engine.invalidate_partitions(student_id=student.id)
+
+
+def invalidate_classroom_galleries(*classroom_ids):
+    """
+    Called when students move between classrooms.
+    """
+    if _engine is not None:
+        _engine.invalidate_partitions(*classroom_ids)
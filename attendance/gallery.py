@@ -0,0 +1,355 @@
+# attendance/gallery.py
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+
+def _normalize(mat):
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    return mat / (norms + 1e-8)
+
+
+# What the recognition hot path needs to know about a student, kept next to their rows.
+StudentMeta = namedtuple("StudentMeta", "id roll_no name classroom_id")
+
+# Storage types of gallery rows; see quantize().
+DTYPES = ("float32", "float16", "int8")
+# Quantized rows are widened to float32 this many at a time while matching.
+MATCH_BLOCK_ROWS = 4096
+
+
+def quantize(vecs, dtype):
+    """
+    Encode normalized float32 rows for storage as (data, scales).
+    int8 rows keep a per-row float32 scale (row ~= data * scale); the
+    other types have no scales.
+    """
+    if dtype == "float32":
+        return vecs, None
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vecs).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.rint(vecs / scales[:, None]).clip(-127, 127).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unknown gallery dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+
+
+def build_prototypes(embeddings, max_prototypes=3, iters=5):
+    """
+    Summarize one student's image embeddings as at most `max_prototypes`
+    vectors: the normalized mean first, then the medoids of a small
+    k-medoids clustering, which keep distinct looks (lighting, angle) that
+    the mean would blur. A single image is returned as is.
+    """
+    emb = _normalize(np.atleast_2d(embeddings))
+    if len(emb) <= 1 or max_prototypes <= 1:
+        return _normalize(emb.mean(axis=0, keepdims=True))
+
+    k = min(max_prototypes - 1, len(emb))
+    sims = emb @ emb.T
+    # Farthest-point seeding, starting from the most central image.
+    medoids = [int(np.argmax(sims.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmin(sims[:, medoids].max(axis=1))))
+    for _ in range(iters):
+        assign = np.argmax(sims[:, medoids], axis=1)
+        new = []
+        for c in range(k):
+            members = np.flatnonzero(assign == c)
+            if len(members) == 0:
+                new.append(medoids[c])
+                continue
+            new.append(int(members[np.argmax(sims[np.ix_(members, members)].sum(axis=1))]))
+        if new == medoids:
+            break
+        medoids = new
+
+    mean = _normalize(emb.mean(axis=0, keepdims=True))
+    return np.concatenate([mean, emb[medoids]])
+
+
+class Gallery:
+    """
+    In-memory gallery of enrolled embeddings.
+
+    Vectors are L2-normalized once and kept packed in a contiguous matrix,
+    so matching a whole frame is a single matrix multiply. The matrix is
+    float32 by default; `dtype` "float16" halves it and "int8" (with a
+    per-row scale) quarters it, for large galleries held by several
+    processes. Quantized rows are matched as stored, see _similarities(). Rows can
+    be added, replaced and removed in place when students change. A student
+    may own a few rows (prototypes, see build_prototypes); a query matches
+    the student through their closest row.
+
+    Each student may also carry a StudentMeta (name, roll number,
+    classroom), so recognized faces can be labelled and classroom rosters
+    cut without a database query.
+
+    An optional approximate index (see attendance.ann) is kept in sync with
+    the first row of every student and takes over matching once the gallery
+    reaches `ann_min_size` rows.
+    """
+
+    def __init__(self, dim=None, capacity=0, ann=None, ann_min_size=0, dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown gallery dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+        self.dim = dim
+        self.ann = ann
+        self.ann_min_size = ann_min_size
+        self.dtype = dtype
+        self._vectors = np.empty((capacity, dim or 0), dtype=dtype)
+        self._scales = np.empty(capacity, dtype=np.float32) if dtype == "int8" else None
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        self._rows_of = {}
+        self._meta = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_arrays(cls, encodings, ids, ann=None, ann_min_size=0, dtype="float32", meta=None):
+        """
+        Build a gallery from a list of embeddings and the matching student
+        ids; a student listed several times gets one row per embedding.
+        `meta` maps student ids to their StudentMeta.
+        """
+        if len(encodings) == 0:
+            return cls(ann=ann, ann_min_size=ann_min_size, dtype=dtype)
+
+        mat = _normalize(np.asarray(encodings, dtype=np.float32))
+        gallery = cls(dim=mat.shape[1], capacity=len(mat), ann=ann,
+                      ann_min_size=ann_min_size, dtype=dtype)
+        gallery._store(slice(None), mat)
+        gallery._ids[:] = ids
+        gallery._size = len(mat)
+        gallery._index_rows()
+        if meta:
+            gallery._meta = {sid: meta[sid] for sid in gallery._rows_of if sid in meta}
+        if ann is not None:
+            first = gallery._first_rows()
+            ann.build(gallery._ids[first], gallery._dequantize(first))
+        return gallery
+
+    def _store(self, rows, vecs):
+        data, scales = quantize(vecs, self.dtype)
+        self._vectors[rows] = data
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def _dequantize(self, rows):
+        """Rows as float32 (a copy unless the gallery is float32)."""
+        vecs = self._vectors[rows]
+        if self.dtype == "float32":
+            return vecs
+        vecs = vecs.astype(np.float32)
+        if self._scales is not None:
+            vecs *= self._scales[rows][:, None]
+        return vecs
+
+    def _index_rows(self):
+        self._rows_of = {}
+        for row, sid in enumerate(self.ids.tolist()):
+            self._rows_of.setdefault(sid, []).append(row)
+
+    def _first_rows(self):
+        return [rows[0] for rows in self._rows_of.values()]
+
+    def __len__(self):
+        """Number of students (not rows)."""
+        return len(self._rows_of)
+
+    @property
+    def size(self):
+        """Number of rows."""
+        return self._size
+
+    def __contains__(self, student_id):
+        return int(student_id) in self._rows_of
+
+    def meta(self, student_id):
+        """The StudentMeta of an enrolled student, or None."""
+        return self._meta.get(int(student_id))
+
+    def set_meta(self, meta):
+        """Update the metadata of an enrolled student; others are ignored."""
+        with self._lock:
+            if meta.id in self._rows_of:
+                self._meta[meta.id] = meta
+
+    def students_in(self, classroom_id):
+        """Ids of the enrolled students of one classroom, from their metadata."""
+        return [sid for sid, meta in self._meta.items() if meta.classroom_id == classroom_id]
+
+    @property
+    def vectors(self):
+        """Rows as float32; quantized galleries return a decoded copy."""
+        return self._dequantize(slice(0, self._size))
+
+    @property
+    def nbytes(self):
+        """Memory held by the rows, their ids and scales."""
+        n = self._size
+        scales = 4 * n if self._scales is not None else 0
+        return self._vectors[:n].nbytes + self._ids[:n].nbytes + scales
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    def subset(self, student_ids):
+        """Exact-match gallery holding only the given students' rows."""
+        with self._lock:
+            rows = [r for sid in map(int, student_ids) for r in self._rows_of.get(sid, ())]
+            rows.sort()
+            part = Gallery(dim=self.dim, capacity=len(rows), dtype=self.dtype)
+            part._vectors[:] = self._vectors[rows]
+            if self._scales is not None:
+                part._scales[:] = self._scales[rows]
+            part._ids[:] = self._ids[rows]
+            part._size = len(rows)
+            part._index_rows()
+            part._meta = {sid: self._meta[sid] for sid in part._rows_of if sid in self._meta}
+            return part
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._vectors))
+        vectors = np.empty((capacity, self.dim), dtype=self.dtype)
+        ids = np.empty(capacity, dtype=np.int64)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._ids = vectors, ids
+        if self._scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+
+    def add(self, student_id, embedding, meta=None):
+        """
+        Add a student, or replace their vectors if they are already enrolled.
+        `embedding` is one vector or a (p, dim) matrix of prototypes; `meta`
+        replaces their StudentMeta when given.
+        """
+        student_id = int(student_id)
+        vecs = _normalize(np.atleast_2d(embedding))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                self._vectors = np.empty((0, self.dim), dtype=self.dtype)
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"Embedding has {vecs.shape[1]} dims, gallery expects {self.dim}")
+
+            rows = self._rows_of.get(student_id, [])
+            if len(rows) != len(vecs):
+                self._remove_rows(student_id)
+                rows = []
+                for _ in range(len(vecs)):
+                    if self._size == len(self._vectors):
+                        self._grow()
+                    self._ids[self._size] = student_id
+                    rows.append(self._size)
+                    self._size += 1
+                self._rows_of[student_id] = rows
+            self._store(rows, vecs)
+            if meta is not None:
+                self._meta[student_id] = meta
+            if self.ann is not None:
+                self.ann.add(student_id, vecs[0])
+
+    replace = add
+
+    def _remove_rows(self, student_id):
+        rows = self._rows_of.pop(student_id, None)
+        if not rows:
+            return False
+        # Fill holes from the end, highest row first, so moved rows stay valid.
+        for row in sorted(rows, reverse=True):
+            last = self._size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._vectors[row] = self._vectors[last]
+                if self._scales is not None:
+                    self._scales[row] = self._scales[last]
+                self._ids[row] = moved
+                moved_rows = self._rows_of[moved]
+                moved_rows[moved_rows.index(last)] = row
+            self._size = last
+        return True
+
+    def remove(self, student_id):
+        """Drop a student. The last rows are moved into the holes to keep rows packed."""
+        student_id = int(student_id)
+        with self._lock:
+            if not self._remove_rows(student_id):
+                return False
+            self._meta.pop(student_id, None)
+            if self.ann is not None:
+                self.ann.remove(student_id)
+            return True
+
+    def _similarities(self, queries):
+        """
+        Cosine similarity of every query to every row. Quantized rows are
+        widened to float32 one block at a time, so the multiply still runs
+        on BLAS without a full-size float32 copy; int8 scales are applied
+        to the products rather than to the rows.
+        """
+        if self.dtype == "float32":
+            return queries @ self.vectors.T
+        sims = np.empty((len(queries), self._size), dtype=np.float32)
+        for start in range(0, self._size, MATCH_BLOCK_ROWS):
+            stop = min(start + MATCH_BLOCK_ROWS, self._size)
+            block = self._vectors[start:stop].astype(np.float32)
+            np.matmul(queries, block.T, out=sims[:, start:stop])
+        if self._scales is not None:
+            sims *= self._scales[:self._size]
+        return sims
+
+    def match(self, embeddings, k=1):
+        """
+        Match every query embedding against the gallery.
+
+        Returns (ids, distances), both shaped (n, k) and sorted by cosine
+        distance. Slots beyond the gallery size hold id -1 and distance inf.
+        """
+        queries = _normalize(np.atleast_2d(embeddings))
+        n = len(queries)
+        ids = np.full((n, k), -1, dtype=np.int64)
+        dists = np.full((n, k), np.inf, dtype=np.float32)
+
+        with self._lock:
+            if n == 0 or self._size == 0:
+                return ids, dists
+            if self.ann is not None and self._size >= self.ann_min_size:
+                return self.ann.search(queries, k)
+
+            sims = self._similarities(queries)
+            if k == 1:
+                # The best row already names the best student.
+                top = np.argmax(sims, axis=1)[:, None]
+                ids[:, :1] = self._ids[top]
+                dists[:, :1] = 1.0 - np.take_along_axis(sims, top, axis=1)
+                return ids, dists
+
+            multi = self._size > len(self._rows_of)
+            # With prototypes, enough rows to still hold k distinct students.
+            kk = min(self._size, k * max(len(r) for r in self._rows_of.values()) if multi else k)
+            top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_ids = self._ids[top]
+            top_dists = 1.0 - np.take_along_axis(sims, top, axis=1)
+
+        if not multi:
+            ids[:, :kk] = top_ids
+            dists[:, :kk] = top_dists
+            return ids, dists
+        for q in range(n):
+            _, first = np.unique(top_ids[q], return_index=True)
+            first = np.sort(first)[:k]
+            ids[q, :len(first)] = top_ids[q, first]
+            dists[q, :len(first)] = top_dists[q, first]
+        return ids, dists
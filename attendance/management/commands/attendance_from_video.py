@@ -0,0 +1,86 @@
+# attendance/management/commands/attendance_from_video.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.models import LAZY_ABSENT, AttendanceSession
+from attendance.offline import default_workers, probe_video, scan_video, write_attendance
+from students.models import ClassRoom
+
+
+class Command(BaseCommand):
+    help = "Take attendance for a session from a recorded video file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("video")
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--session", type=int, help="Existing session to fill in.")
+        target.add_argument("--classroom", type=int, help="Create a new session for this classroom.")
+        parser.add_argument("--sample-fps", type=float, default=2.0,
+                            help="Frames per second of video to recognize (default 2).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default RECOGNITION_WORKERS or one per core).")
+        parser.add_argument("--chunks", type=int, default=None,
+                            help="Pieces to split the video into (default 4 per worker).")
+        parser.add_argument("--min-sightings", type=int, default=1,
+                            help="Recognized frames needed to mark a student present.")
+        parser.add_argument("--dry-run", action="store_true", help="Report without writing records.")
+
+    def handle(self, *args, **opts):
+        path = opts["video"]
+        try:
+            _, fps = probe_video(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if opts["session"]:
+            try:
+                session = AttendanceSession.objects.select_related("classroom").get(id=opts["session"])
+            except AttendanceSession.DoesNotExist:
+                raise CommandError(f"Session {opts['session']} does not exist")
+            classroom = session.classroom
+        else:
+            try:
+                classroom = ClassRoom.objects.get(id=opts["classroom"])
+            except ClassRoom.DoesNotExist:
+                raise CommandError(f"Classroom {opts['classroom']} does not exist")
+            session = None
+
+        every = max(1, round(fps / opts["sample_fps"])) if fps else 1
+        workers = opts["workers"] or default_workers()
+        self.stdout.write(
+            f"Scanning {path} ({fps:.1f} fps) every {every} frame(s) with {workers} worker(s)"
+        )
+
+        def progress(done, total):
+            self.stdout.write(f"  chunk {done}/{total}")
+
+        result = scan_video(path, every=every, workers=workers, chunks=opts["chunks"],
+                            classroom_id=classroom.id, progress=progress)
+
+        present = {sid for sid, n in result["sightings"].items() if n >= opts["min_sightings"]}
+        elapsed = result["elapsed"]
+        self.stdout.write(
+            f"Decoded {result['frames']} frames ({result['frames'] / elapsed:.1f} fps), "
+            f"recognized {result['recognized_frames']} in {elapsed:.1f}s"
+        )
+        if result["video_seconds"]:
+            self.stdout.write(
+                f"Video length {result['video_seconds']:.1f}s, "
+                f"{result['video_seconds'] / elapsed:.1f}x real time"
+            )
+
+        if opts["dry_run"]:
+            self.stdout.write(f"Would mark {len(present)} students present: {sorted(present)}")
+            return
+
+        if session is None:
+            # A recording is over by definition, so the session is closed right away.
+            session = AttendanceSession.objects.create(
+                classroom=classroom, end_time=timezone.now(), lazy_absent=LAZY_ABSENT,
+            )
+        created, updated = write_attendance(session, present)
+        self.stdout.write(self.style.SUCCESS(
+            f"Session {session.id}: {len(present)} present, "
+            f"{created} records created, {updated} updated"
+        ))
@@ -0,0 +1,65 @@
+# attendance/management/commands/bench_ann.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from attendance.ann import IVFIndex
+from attendance.gallery import Gallery
+
+
+def _synthetic_gallery(rng, size, dim, clusters=256):
+    """Embeddings grouped loosely around a few hundred directions, like real faces."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size)]
+    vectors = vectors + 0.8 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors
+
+
+class Command(BaseCommand):
+    help = "Report recall@1 against exact search and queries/second for the IVF index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,50000,100000")
+        parser.add_argument("--nprobes", default="1,4,8,16,32")
+        parser.add_argument("--nlist", type=int, default=None)
+        parser.add_argument("--queries", type=int, default=400)
+        parser.add_argument("--faces", type=int, default=20, help="Queries matched per call, like faces per frame.")
+        parser.add_argument("--dim", type=int, default=128)
+
+    def _qps(self, search, queries, faces):
+        start = time.perf_counter()
+        results = [search(queries[i:i + faces]) for i in range(0, len(queries), faces)]
+        elapsed = time.perf_counter() - start
+        ids = np.concatenate([r[0][:, 0] for r in results])
+        return ids, len(queries) / elapsed
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        nprobes = [int(p) for p in opts["nprobes"].split(",") if p]
+
+        for size in [int(s) for s in opts["sizes"].split(",") if s]:
+            vectors = _synthetic_gallery(rng, size, opts["dim"])
+            ids = np.arange(size)
+            # Queries are noisy re-captures of enrolled students.
+            picks = rng.integers(0, size, opts["queries"])
+            queries = vectors[picks] + 0.5 * rng.standard_normal((len(picks), opts["dim"])).astype(np.float32)
+
+            exact = Gallery.from_arrays(vectors, ids)
+            truth, exact_qps = self._qps(lambda q: exact.match(q, k=1), queries, opts["faces"])
+
+            index = IVFIndex(nlist=opts["nlist"])
+            start = time.perf_counter()
+            index.build(ids, vectors)
+            build_s = time.perf_counter() - start
+
+            self.stdout.write(
+                f"\n{size} students, nlist={len(index.centroids)}, build {build_s:.1f}s, "
+                f"exact {exact_qps:,.0f} q/s"
+            )
+            self.stdout.write(f"{'nprobe':>7} {'recall@1':>9} {'q/s':>10} {'speedup':>8}")
+            for nprobe in nprobes:
+                found, qps = self._qps(lambda q: index.search(q, k=1, nprobe=nprobe), queries, opts["faces"])
+                recall = float(np.mean(found == truth))
+                self.stdout.write(f"{nprobe:>7} {recall:>9.3f} {qps:>10,.0f} {qps / exact_qps:>7.1f}x")
@@ -0,0 +1,153 @@
+# attendance/management/commands/bench_detection.py
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.detection import (
+    DETECTOR, DetectOptions, evaluate_detector, load_labelled_images, make_detector,
+)
+
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def _face_photos(image_dir, detector, limit):
+    """(image, face box) of photos with one clear face; enrolled student photos by default."""
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    else:
+        from students.models import Student
+        paths = [s.photo.path for s in Student.objects.exclude(photo="")]
+    photos = []
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        faces = detector.detect(image, DetectOptions(width=None))
+        if len(faces) == 1:
+            photos.append((image, faces[0]))
+        if len(photos) >= limit:
+            break
+    return photos
+
+
+def _sample_frame(rng, size, photos, per_frame):
+    """
+    A classroom-like frame: photos pasted at random scales and positions
+    on a textured background. Returns the frame and the true face boxes.
+    """
+    w, h = size
+    frame = rng.integers(60, 120, (h, w, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (0, 0), 3)
+    truth = []
+    cols = int(np.ceil(np.sqrt(per_frame * w / h)))
+    rows = int(np.ceil(per_frame / cols))
+    cell_w, cell_h = w // cols, h // rows
+    for i in range(per_frame):
+        image, (fx, fy, fw, fh) = photos[rng.integers(len(photos))]
+        # Faces span 4-12% of the frame height, like students across a room.
+        scale = rng.uniform(0.04, 0.12) * h / fh
+        pw = min(int(image.shape[1] * scale), cell_w)
+        ph = min(int(image.shape[0] * scale), cell_h)
+        if pw < 8 or ph < 8:
+            continue
+        x = (i % cols) * cell_w + rng.integers(0, cell_w - pw + 1)
+        y = (i // cols) * cell_h + rng.integers(0, cell_h - ph + 1)
+        frame[y:y + ph, x:x + pw] = cv2.resize(image, (pw, ph), interpolation=cv2.INTER_AREA)
+        sx, sy = pw / image.shape[1], ph / image.shape[0]
+        truth.append((x + int(fx * sx), y + int(fy * sy), int(fw * sx), int(fh * sy)))
+    return frame, truth
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare face detector backends and detection widths: latency, recall "
+        "and precision on sample 720p, 1080p and 4K frames, or on a labelled "
+        "image set."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", default=None,
+                            help="Directory of face photos to build frames from (default: student photos).")
+        parser.add_argument("--labels", default=None,
+                            help="Use a labelled image set instead of sample frames: CSV with columns "
+                                 "image, x, y, w, h (one row per face).")
+        parser.add_argument("--detectors", default=DETECTOR,
+                            help="Comma separated backends: haar, yunet, ssd, deepface:<backend>.")
+        parser.add_argument("--widths", default="0,960,640,480",
+                            help="Detection widths to compare; 0 is full resolution.")
+        parser.add_argument("--resolutions", default="720p,1080p,4K")
+        parser.add_argument("--frames", type=int, default=10)
+        parser.add_argument("--faces", type=int, default=12, help="Faces per frame.")
+        parser.add_argument("--min-face", type=int, default=None, help="Minimum face size in frame pixels.")
+        parser.add_argument("--min-iou", type=float, default=0.4)
+        parser.add_argument("--repeat", type=int, default=1)
+
+    def _load_detectors(self, names):
+        detectors = []
+        for name in names:
+            try:
+                detectors.append(make_detector(name))
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"{name}: unavailable: {e}"))
+        if not detectors:
+            raise CommandError("No usable detector")
+        return detectors
+
+    def _compare(self, samples, detectors, widths, opts, frame_width=None):
+        self.stdout.write(
+            f"{'detector':<20} {'width':>6} {'ms/image':>9} {'recall':>7} {'precision':>10} {'speedup':>8}"
+        )
+        for detector in detectors:
+            # First image once untimed, so model loading is not counted.
+            detector.detect(samples[0][0])
+            base_ms = None
+            for width in widths:
+                options = DetectOptions(width=width or None, min_size=opts["min_face"])
+                results = [
+                    evaluate_detector(detector, samples, options, opts["min_iou"])
+                    for _ in range(max(opts["repeat"], 1))
+                ]
+                ms = min(r["ms_per_image"] for r in results)
+                recall, precision = results[0]["recall"], results[0]["precision"]
+                base_ms = base_ms or ms
+                label = "full" if not width or (frame_width and width >= frame_width) else str(width)
+                self.stdout.write(
+                    f"{detector.name:<20} {label:>6} {ms:>9.1f} "
+                    f"{'-' if recall is None else f'{recall:.3f}':>7} "
+                    f"{'-' if precision is None else f'{precision:.3f}':>10} {base_ms / ms:>7.1f}x"
+                )
+
+    def handle(self, *args, **opts):
+        detectors = self._load_detectors([d for d in opts["detectors"].split(",") if d])
+        widths = [int(w) for w in opts["widths"].split(",") if w]
+
+        if opts["labels"]:
+            try:
+                samples = load_labelled_images(opts["labels"])
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+            faces = sum(len(boxes) for _, boxes in samples)
+            self.stdout.write(f"{len(samples)} images, {faces} labelled faces")
+            self._compare(samples, detectors, widths, opts)
+            return
+
+        # The first detector finds the true face box in each photo.
+        photos = _face_photos(opts["images"], detectors[0], limit=200)
+        if not photos:
+            raise CommandError("No photo with exactly one detectable face; pass --images DIR or --labels CSV")
+
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{len(photos)} face photos, {opts['frames']} frames x {opts['faces']} faces")
+
+        for name in [r for r in opts["resolutions"].split(",") if r]:
+            if name not in RESOLUTIONS:
+                raise CommandError(f"Unknown resolution {name}; choose from {', '.join(RESOLUTIONS)}")
+            size = RESOLUTIONS[name]
+            frames = [_sample_frame(rng, size, photos, opts["faces"]) for _ in range(opts["frames"])]
+
+            self.stdout.write(f"\n{name} ({size[0]}x{size[1]})")
+            self._compare(frames, detectors, widths, opts, frame_width=size[0])
@@ -0,0 +1,66 @@
+# attendance/management/commands/bench_embedding.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from deepface import DeepFace
+
+from attendance.face_utils import MODEL_NAME, EMBED_BATCH_SIZE, embed_faces
+
+
+def _grid_boxes(count, frame_w, frame_h, size):
+    """Lay `count` square face boxes out on a grid inside the frame."""
+    per_row = max(1, frame_w // size)
+    boxes = []
+    for i in range(count):
+        x = (i % per_row) * size
+        y = ((i // per_row) * size) % max(1, frame_h - size)
+        boxes.append((x, y, size, size))
+    return np.array(boxes, dtype=np.int32)
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-frame embedding latency against the number of faces in view."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--counts", default="1,5,10,20,40,60",
+                            help="Comma separated face counts to measure.")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Frames timed per face count.")
+        parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+        parser.add_argument("--width", type=int, default=1280)
+        parser.add_argument("--height", type=int, default=720)
+        parser.add_argument("--face-size", type=int, default=96)
+
+    def handle(self, *args, **opts):
+        counts = [int(c) for c in opts["counts"].split(",") if c]
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 255, (opts["height"], opts["width"], 3), dtype=np.uint8)
+
+        # Load the model outside the timed region.
+        DeepFace.build_model(MODEL_NAME)
+
+        self.stdout.write(f"{'faces':>6} {'per-face ms':>12} {'batched ms':>11} {'speedup':>8}")
+        for count in counts:
+            boxes = _grid_boxes(count, opts["width"], opts["height"], opts["face_size"])
+
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                for (x, y, w, h) in boxes:
+                    DeepFace.represent(
+                        img_path=frame[y:y + h, x:x + w],
+                        model_name=MODEL_NAME,
+                        detector_backend="skip",
+                        enforce_detection=False,
+                    )
+            loop_ms = (time.perf_counter() - start) * 1000 / opts["repeat"]
+
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                embed_faces(frame, boxes, batch_size=opts["batch_size"])
+            batch_ms = (time.perf_counter() - start) * 1000 / opts["repeat"]
+
+            self.stdout.write(
+                f"{count:>6} {loop_ms:>12.1f} {batch_ms:>11.1f} {loop_ms / max(batch_ms, 1e-9):>7.1f}x"
+            )
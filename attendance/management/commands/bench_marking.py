@@ -0,0 +1,150 @@
+# attendance/management/commands/bench_marking.py
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from attendance.marking import AttendanceMarker
+from attendance.models import AttendanceRecord, AttendanceSession
+from students.models import ClassRoom, Student
+
+
+@contextmanager
+def _throwaway_database():
+    """
+    Point the default database at a fresh, migrated copy for the duration
+    (as the test runner does), so the benchmark never writes to real data.
+    """
+    old_name = connection.settings_dict["NAME"]
+    tmp = tempfile.mkdtemp(prefix="bench_marking-")
+    if connection.vendor == "sqlite":
+        # A file rather than the in-memory default: the runs use several threads.
+        connection.settings_dict["TEST"] = {
+            **connection.settings_dict.get("TEST", {}), "NAME": os.path.join(tmp, "bench.sqlite3"),
+        }
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _per_frame_mark(session_id, student_ids):
+    """The original per-frame marking from gen_frames."""
+    for sid in student_ids:
+        record, created = AttendanceRecord.objects.get_or_create(
+            session_id=session_id,
+            student_id=sid,
+            defaults={"status": "PRESENT"},
+        )
+        if not created and record.status != "PRESENT":
+            record.status = "PRESENT"
+            record.save()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-frame get_or_create marking with the write-behind "
+        "AttendanceMarker over simulated sessions running concurrently, "
+        "in a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions (one thread each).")
+        parser.add_argument("--students", type=int, default=60, help="Students per class.")
+        parser.add_argument("--frames", type=int, default=300, help="Recognized frames per session.")
+        parser.add_argument("--faces", type=int, default=20, help="Students recognized per frame.")
+
+    def _run(self, name, sessions, streams, mark_frame, finish):
+        errors = []
+        queries = []
+
+        def worker(session, frames):
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    state = {}
+                    for ids in frames:
+                        mark_frame(session, ids, state)
+                    finish(session, state)
+                queries.append(len(captured))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(s, f)) for s, f in zip(sessions, streams)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        present = AttendanceRecord.objects.filter(session__in=sessions, status="PRESENT").count()
+        frames = sum(len(f) for f in streams)
+        self.stdout.write(
+            f"{name:<14} {elapsed:>8.2f} {frames / elapsed:>10,.0f} {sum(queries):>9} "
+            f"{present:>8} {len(errors):>7}"
+        )
+        for error in errors[:3]:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
+
+    def handle(self, *args, **opts):
+        with _throwaway_database():
+            self._bench(opts)
+
+    def _bench(self, opts):
+        rng = np.random.default_rng(0)
+        classroom = ClassRoom.objects.create(name="bench_marking")
+        Student.objects.bulk_create([
+            Student(roll_no=f"bench-{classroom.id}-{i}", name=f"Bench {i}", classroom=classroom)
+            for i in range(opts["students"])
+        ])
+        ids = list(Student.objects.filter(classroom=classroom).values_list("id", flat=True))
+        faces = min(opts["faces"], len(ids))
+        # The same recognitions for both runs: a few students in view per frame.
+        streams = [
+            [rng.choice(ids, faces, replace=False).tolist() for _ in range(opts["frames"])]
+            for _ in range(opts["sessions"])
+        ]
+
+        def new_sessions():
+            sessions = [AttendanceSession.objects.create(classroom=classroom) for _ in streams]
+            AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(session=s, student_id=sid, status="ABSENT")
+                for s in sessions for sid in ids
+            ])
+            return sessions
+
+        self.stdout.write(
+            f"{opts['sessions']} sessions x {opts['frames']} frames x {faces} recognized faces, "
+            f"{len(ids)} students per class"
+        )
+        self.stdout.write(
+            f"{'marking':<14} {'seconds':>8} {'frames/s':>10} {'queries':>9} {'present':>8} {'errors':>7}"
+        )
+        self._run(
+            "per-frame ORM", new_sessions(), streams,
+            lambda s, frame, state: _per_frame_mark(s.id, frame),
+            lambda s, state: None,
+        )
+
+        def marker_frame(session, frame, state):
+            if "marker" not in state:
+                state["marker"] = AttendanceMarker(session.id)
+            state["marker"].mark(frame)
+
+        self._run(
+            "write-behind", new_sessions(), streams, marker_frame,
+            lambda s, state: state["marker"].flush(),
+        )
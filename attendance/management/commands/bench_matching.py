@@ -0,0 +1,61 @@
+# attendance/management/commands/bench_matching.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from attendance.gallery import Gallery
+
+
+def _loop_match(known_encodings, embeddings):
+    """The original per-face matcher from recognize_from_frame."""
+    results = []
+    for emb in embeddings:
+        enc_mat = np.stack(known_encodings, axis=0)
+        num = np.sum(enc_mat * emb, axis=1)
+        den = (np.linalg.norm(enc_mat, axis=1) * np.linalg.norm(emb) + 1e-8)
+        cos_dist = 1.0 - num / den
+        best_idx = int(np.argmin(cos_dist))
+        results.append((best_idx, float(cos_dist[best_idx])))
+    return results
+
+
+class Command(BaseCommand):
+    help = "Compare the per-face loop matcher with the Gallery matmul matcher."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000,50000",
+                            help="Comma separated numbers of enrolled students.")
+        parser.add_argument("--faces", type=int, default=20, help="Faces per frame.")
+        parser.add_argument("--dim", type=int, default=128)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        sizes = [int(s) for s in opts["sizes"].split(",") if s]
+
+        self.stdout.write(f"{'students':>9} {'loop ms':>9} {'gallery ms':>11} {'speedup':>8}")
+        for size in sizes:
+            known = rng.standard_normal((size, opts["dim"])).astype(np.float32)
+            known_encodings = list(known)
+            known_ids = list(range(size))
+            frame_embs = rng.standard_normal((opts["faces"], opts["dim"])).astype(np.float32)
+            gallery = Gallery.from_arrays(known_encodings, known_ids)
+
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                expected = _loop_match(known_encodings, frame_embs)
+            loop_ms = (time.perf_counter() - start) * 1000 / opts["repeat"]
+
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                ids, _ = gallery.match(frame_embs, k=1)
+            gallery_ms = (time.perf_counter() - start) * 1000 / opts["repeat"]
+
+            if [known_ids[i] for i, _ in expected] != ids[:, 0].tolist():
+                self.stderr.write(f"Matchers disagree at {size} students")
+
+            self.stdout.write(
+                f"{size:>9} {loop_ms:>9.2f} {gallery_ms:>11.2f} {loop_ms / max(gallery_ms, 1e-9):>7.1f}x"
+            )
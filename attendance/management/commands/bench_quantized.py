@@ -0,0 +1,56 @@
+# attendance/management/commands/bench_quantized.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from attendance.gallery import DTYPES, Gallery
+from attendance.management.commands.bench_ann import _synthetic_gallery
+
+
+class Command(BaseCommand):
+    help = (
+        "Report memory, match throughput and top-1 agreement with float32 "
+        "for float16 and int8 galleries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,50000,200000")
+        parser.add_argument("--queries", type=int, default=400)
+        parser.add_argument("--faces", type=int, default=20, help="Queries matched per call, like faces per frame.")
+        parser.add_argument("--dim", type=int, default=128)
+
+    def _run(self, gallery, queries, faces):
+        start = time.perf_counter()
+        results = [gallery.match(queries[i:i + faces], k=1) for i in range(0, len(queries), faces)]
+        elapsed = time.perf_counter() - start
+        ids = np.concatenate([r[0][:, 0] for r in results])
+        dists = np.concatenate([r[1][:, 0] for r in results])
+        return ids, dists, len(queries) / elapsed
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+
+        for size in [int(s) for s in opts["sizes"].split(",") if s]:
+            vectors = _synthetic_gallery(rng, size, opts["dim"])
+            ids = np.arange(size)
+            # Queries are noisy re-captures of enrolled students.
+            picks = rng.integers(0, size, opts["queries"])
+            queries = vectors[picks] + 0.5 * rng.standard_normal((len(picks), opts["dim"])).astype(np.float32)
+
+            self.stdout.write(f"\n{size} students, {opts['dim']} dims")
+            self.stdout.write(
+                f"{'dtype':>8} {'MB':>8} {'q/s':>10} {'top-1 agree':>12} {'max dist err':>13}"
+            )
+            truth = truth_dists = None
+            for dtype in DTYPES:
+                gallery = Gallery.from_arrays(vectors, ids, dtype=dtype)
+                found, dists, qps = self._run(gallery, queries, opts["faces"])
+                if truth is None:
+                    truth, truth_dists = found, dists
+                agree = float(np.mean(found == truth))
+                err = float(np.max(np.abs(dists - truth_dists)))
+                self.stdout.write(
+                    f"{dtype:>8} {gallery.nbytes / 2**20:>8.1f} {qps:>10,.0f} {agree:>12.4f} {err:>13.5f}"
+                )
@@ -0,0 +1,62 @@
+# attendance/management/commands/bench_workers.py
+
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from attendance.face_utils import RecognitionEngine
+from attendance.workers import RecognitionPool
+
+
+def _load_frames(frames_dir, count, width, height):
+    if frames_dir:
+        paths = sorted(p for p in Path(frames_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        frames = [cv2.imread(str(p)) for p in paths]
+        frames = [f for f in frames if f is not None]
+        if frames:
+            return [frames[i % len(frames)] for i in range(count)]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Measure recognition throughput of the worker pool against the in-process engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", default="1,2,4,8",
+                            help="Comma separated pool sizes to measure.")
+        parser.add_argument("--frames", type=int, default=200)
+        parser.add_argument("--frames-dir", default=None,
+                            help="Directory of sample frames (defaults to synthetic 720p frames).")
+        parser.add_argument("--width", type=int, default=1280)
+        parser.add_argument("--height", type=int, default=720)
+
+    def handle(self, *args, **opts):
+        frames = _load_frames(opts["frames_dir"], opts["frames"], opts["width"], opts["height"])
+        max_bytes = max(f.nbytes for f in frames)
+
+        engine = RecognitionEngine()
+        start = time.perf_counter()
+        for frame in frames:
+            engine.recognize(frame)
+        base_fps = len(frames) / (time.perf_counter() - start)
+        self.stdout.write(f"{'workers':>8} {'frames/s':>9} {'speedup':>8} {'efficiency':>11}")
+        self.stdout.write(f"{'in-proc':>8} {base_fps:>9.1f} {1.0:>7.2f}x {'':>11}")
+
+        for workers in [int(w) for w in opts["workers"].split(",") if w]:
+            pool = RecognitionPool(workers, max_frame_bytes=max_bytes)
+            try:
+                pool.wait_ready()
+                start = time.perf_counter()
+                # Keep every slot busy, collecting results in submission order.
+                futures = [pool.submit(frame) for frame in frames]
+                for future in futures:
+                    future.result()
+                fps = len(frames) / (time.perf_counter() - start)
+            finally:
+                pool.close()
+            speedup = fps / base_fps
+            self.stdout.write(f"{workers:>8} {fps:>9.1f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
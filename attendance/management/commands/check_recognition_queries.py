@@ -0,0 +1,70 @@
+# attendance/management/commands/check_recognition_queries.py
+
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from attendance.face_utils import FaceTracker, get_engine
+from students.models import Student
+
+
+def _frames(video, limit):
+    if video:
+        cap = cv2.VideoCapture(video)
+        try:
+            while limit > 0:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                limit -= 1
+                yield frame
+        finally:
+            cap.release()
+        return
+    # Enrolled photos are frames every student should be recognized in.
+    for student in Student.objects.exclude(photo="")[:limit]:
+        frame = cv2.imread(student.photo.path)
+        if frame is not None:
+            yield frame
+
+
+class Command(BaseCommand):
+    help = (
+        "Run recognition over sample frames and fail if the hot path makes "
+        "any database query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video", default=None, help="Video file to take frames from (default: student photos).")
+        parser.add_argument("--frames", type=int, default=100)
+        parser.add_argument("--classroom", type=int, default=None, help="Match against this classroom's roster.")
+
+    def handle(self, *args, **opts):
+        frames = list(_frames(opts["video"], opts["frames"]))
+        if not frames:
+            raise CommandError("No frames to run; pass --video or enroll some students")
+
+        engine = get_engine()
+        # Loading the gallery and its metadata is the one expected query.
+        engine.sync_gallery(force=True)
+        tracker = FaceTracker() if opts["video"] else None
+
+        faces = recognized = 0
+        with CaptureQueriesContext(connection) as queries:
+            for frame in frames:
+                results = engine.recognize(frame, classroom_id=opts["classroom"], tracker=tracker)
+                faces += len(results)
+                recognized += sum(1 for r in results if r.student_id is not None)
+
+        self.stdout.write(
+            f"{len(frames)} frames, {faces} faces, {recognized} recognized, "
+            f"{len(queries)} database queries"
+        )
+        if recognized == 0:
+            self.stdout.write(self.style.WARNING("Nothing was recognized, so name lookups were not exercised"))
+        if len(queries):
+            for query in queries.captured_queries[:10]:
+                self.stdout.write(f"  {query['sql']}")
+            raise CommandError(f"Recognition made {len(queries)} database queries")
+        self.stdout.write(self.style.SUCCESS("No database queries on the recognition path"))
@@ -0,0 +1,43 @@
+# attendance/management/commands/gc_embedding_cache.py
+
+from django.core.management.base import BaseCommand
+
+from attendance.embedding_cache import file_digest, gc_cache
+from attendance.face_utils import CACHE_DIR, CACHE_METHODS, get_embedding_cache
+from students.models import Student, StudentImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete embedding cache entries whose image no longer belongs to any "
+        "student, and entries of other models or DeepFace versions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report what would be deleted.")
+
+    def handle(self, *args, **opts):
+        files = [f for f in Student.objects.values_list("photo", flat=True) if f]
+        files += [f for f in StudentImage.objects.values_list("image", flat=True) if f]
+
+        keep, missing = set(), 0
+        storage = Student._meta.get_field("photo").storage
+        for name in files:
+            try:
+                keep.add(file_digest(storage.path(name)))
+            except OSError:
+                missing += 1
+
+        caches = [get_embedding_cache(method) for method in CACHE_METHODS]
+        before = sum(len(c.digests()) for c in caches)
+        removed, freed = gc_cache(CACHE_DIR, {c.namespace for c in caches}, keep, opts["dry_run"])
+
+        verb = "Would remove" if opts["dry_run"] else "Removed"
+        self.stdout.write(
+            f"{len(files)} student images ({missing} missing on disk), "
+            f"{before} current cache entries"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} orphaned entries ({freed / 1024:.1f} KiB)"
+        ))
@@ -0,0 +1,63 @@
+# attendance/management/commands/import_encodings.py
+
+import re
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from attendance.face_utils import ENC_DIR, MODEL_NAME, STORE_DIR, get_store
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Import legacy per-student student_<id>_<model>.npy encodings "
+        "into the packed embedding store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete", action="store_true",
+                            help="Remove the per-student .npy files after a successful import.")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Embeddings written per store transaction.")
+        parser.add_argument("--force", action="store_true",
+                            help="Also import students the store already has, replacing their embeddings.")
+
+    def handle(self, *args, **opts):
+        pattern = re.compile(rf"^student_(\d+)_{re.escape(MODEL_NAME)}\.npy$")
+        existing = set(Student.objects.values_list("id", flat=True))
+        store = get_store()
+        # Enrolled since the store took over: the legacy file is older.
+        stored = set() if opts["force"] else set(store.ids().tolist())
+
+        files, skipped, kept = [], 0, 0
+        for path in sorted(ENC_DIR.glob(f"student_*_{MODEL_NAME}.npy")):
+            match = pattern.match(path.name)
+            if not match:
+                continue
+            sid = int(match.group(1))
+            if sid not in existing:
+                skipped += 1
+                continue
+            if sid in stored:
+                kept += 1
+                continue
+            files.append((sid, path))
+
+        batch = opts["batch_size"]
+        for start in range(0, len(files), batch):
+            chunk = files[start:start + batch]
+            store.put_many(
+                [sid for sid, _ in chunk],
+                [np.load(str(path)).reshape(-1) for _, path in chunk],
+            )
+            self.stdout.write(f"Imported {start + len(chunk)}/{len(files)}")
+
+        if opts["delete"]:
+            for _, path in files:
+                path.unlink()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(files)} encodings into {STORE_DIR} "
+            f"({skipped} skipped for deleted students, {kept} already in the store; --force replaces them)"
+        ))
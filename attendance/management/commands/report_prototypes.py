@@ -0,0 +1,106 @@
+# attendance/management/commands/report_prototypes.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.face_utils import DIST_THRESHOLD, MAX_PROTOTYPES
+from attendance.gallery import Gallery, _normalize, build_prototypes
+
+
+def _synthetic(students, images, dim, conditions, rng):
+    """
+    Unit-length identities in a low-rank subspace, so neighbours are close
+    like real faces, plus a per-student offset for each of a few
+    conditions (lighting, pose) and some noise. Image 0 of every student
+    is the enrollment photo, taken under condition 0.
+    """
+    rank = 8
+    centers = _normalize(rng.standard_normal((students, rank)) @ rng.standard_normal((rank, dim)))
+    data = []
+    for center in centers:
+        looks = _normalize(rng.standard_normal((conditions, dim))) * 0.8
+        cond = rng.integers(0, conditions, images)
+        cond[0] = 0
+        noise = _normalize(rng.standard_normal((images, dim))) * 0.15
+        data.append((center + looks[cond] + noise).astype(np.float32))
+    return data
+
+
+def _real():
+    """Per-student image embeddings of every student with at least two images."""
+    from attendance.face_utils import embed_image_file
+    from students.models import Student
+
+    data, ids = [], []
+    for student in Student.objects.prefetch_related("images"):
+        paths = [student.photo.path] if student.photo else []
+        paths += [img.image.path for img in student.images.all() if img.image]
+        if len(paths) < 2:
+            continue
+        embs = []
+        for path in paths:
+            try:
+                embs.append(embed_image_file(path))
+            except ValueError as e:
+                print(f"[WARN] Skipping {path}: {e}")
+        if len(embs) >= 2:
+            data.append(np.stack(embs))
+            ids.append(student.id)
+    return data, ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare recall and matching latency of multi-image prototypes "
+        "against the single-photo baseline (leave-one-image-out)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--synthetic", type=int, default=0,
+                            help="Use this many synthetic students instead of the enrolled ones.")
+        parser.add_argument("--images", type=int, default=6, help="Images per synthetic student.")
+        parser.add_argument("--dim", type=int, default=128)
+        parser.add_argument("--prototypes", type=int, default=MAX_PROTOTYPES)
+        parser.add_argument("--threshold", type=float, default=DIST_THRESHOLD)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        if opts["synthetic"]:
+            data = _synthetic(opts["synthetic"], opts["images"], opts["dim"], 4, rng)
+            ids = list(range(len(data)))
+        else:
+            data, ids = _real()
+        if not data:
+            raise CommandError("No student has two or more images; try --synthetic 1000")
+
+        # Hold out the last image of every student as the query.
+        queries = np.stack([embs[-1] for embs in data])
+        baselines = {
+            "single photo": Gallery.from_arrays([embs[0] for embs in data], ids),
+            "mean only": Gallery.from_arrays(
+                np.concatenate([build_prototypes(embs[:-1], 1) for embs in data]), ids
+            ),
+        }
+        protos = [build_prototypes(embs[:-1], opts["prototypes"]) for embs in data]
+        baselines[f"mean + medoids (<= {opts['prototypes']})"] = Gallery.from_arrays(
+            np.concatenate(protos), np.repeat(ids, [len(p) for p in protos])
+        )
+
+        expected = np.asarray(ids)
+        self.stdout.write(
+            f"{len(ids)} students, {sum(len(e) for e in data)} images, threshold {opts['threshold']}"
+        )
+        self.stdout.write(f"{'gallery':<28} {'rows':>6} {'top-1':>7} {'recall':>7} {'match ms':>9}")
+        for name, gallery in baselines.items():
+            best, dists = gallery.match(queries, k=1)
+            top1 = float(np.mean(best[:, 0] == expected))
+            recall = float(np.mean((best[:, 0] == expected) & (dists[:, 0] < opts["threshold"])))
+
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                gallery.match(queries, k=1)
+            ms = (time.perf_counter() - start) * 1000 / opts["repeat"]
+            self.stdout.write(f"{name:<28} {gallery.size:>6} {top1:>7.3f} {recall:>7.3f} {ms:>9.2f}")
@@ -0,0 +1,101 @@
+# attendance/management/commands/run_cameras.py
+
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.broadcast import broadcast_stats
+from attendance.models import AttendanceSession, CameraSource
+from attendance.pipeline import get_capacity, pipeline_stats
+from attendance.views import watch_camera
+from attendance.workers import get_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the live streams of a session headless, e.g. with video files "
+        "standing in for cameras, and report what was recognized."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", type=int, required=True)
+        parser.add_argument("--source", action="append", default=[],
+                            help="Camera index, video file or stream URL; repeat for more "
+                                 "cameras. Replaces the cameras attached to the session.")
+        parser.add_argument("--seconds", type=float, default=None,
+                            help="Stop after this long (default: until every source ends).")
+        parser.add_argument("--viewers", type=int, default=1,
+                            help="Simulated viewers per camera, all sharing one stream.")
+        parser.add_argument("--viewer-delay", type=float, default=0.0,
+                            help="Seconds each viewer spends per frame, to simulate slow clients.")
+
+    def handle(self, *args, **opts):
+        try:
+            session = AttendanceSession.objects.get(id=opts["session"])
+        except AttendanceSession.DoesNotExist:
+            raise CommandError(f"Session {opts['session']} does not exist")
+
+        if opts["source"]:
+            cameras = [
+                CameraSource.objects.get_or_create(source=src, defaults={"name": src})[0]
+                for src in opts["source"]
+            ]
+            session.cameras.set(cameras)
+        sources = session.camera_sources()
+
+        stop = threading.Event()
+        frames = {}
+        broadcasts_seen = set()
+
+        def stream(source, viewer):
+            frames[source, viewer] = 0
+            subscriber = watch_camera(session.id, source)
+            broadcasts_seen.add(subscriber.broadcast)
+            gen = subscriber.frames()
+            try:
+                for _ in gen:
+                    frames[source, viewer] += 1
+                    if stop.is_set():
+                        break
+                    if opts["viewer_delay"]:
+                        time.sleep(opts["viewer_delay"])
+            finally:
+                gen.close()
+
+        viewers = max(opts["viewers"], 1)
+        threads = [
+            threading.Thread(target=stream, args=(src, v), daemon=True)
+            for src in sources for v in range(viewers)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+
+        deadline = start + opts["seconds"] if opts["seconds"] else None
+        streams = broadcasts = []
+        while any(t.is_alive() for t in threads):
+            # Last look at the live streams before they shut down.
+            streams = pipeline_stats(session.id) or streams
+            broadcasts = broadcast_stats(session.id) or broadcasts
+            if deadline and time.perf_counter() >= deadline:
+                stop.set()
+                break
+            time.sleep(0.2)
+        for t in threads:
+            t.join()
+        for broadcast in broadcasts_seen:
+            # The producers write their last marks once the viewers are gone.
+            broadcast.join()
+        elapsed = time.perf_counter() - start
+
+        for (src, viewer), count in sorted(frames.items()):
+            self.stdout.write(f"{src} viewer {viewer}: {count} frames, {count / elapsed:.1f} fps")
+        self.stdout.write(json.dumps({
+            "streams": streams,
+            "broadcasts": broadcasts,
+            "capacity": get_capacity(get_pool()).stats(),
+        }, indent=2))
+        present = session.records.filter(status="PRESENT").count()
+        self.stdout.write(f"Marked present across {len(sources)} camera(s): {present} students")
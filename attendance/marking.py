@@ -0,0 +1,196 @@
+# attendance/marking.py
+
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord
+
+
+# Seconds newly marked students may wait in memory before they are written...
+FLUSH_INTERVAL = getattr(settings, "ATTENDANCE_MARK_FLUSH_INTERVAL", 2.0)
+# ...or how many may pile up before an early write.
+FLUSH_SIZE = getattr(settings, "ATTENDANCE_MARK_FLUSH_SIZE", 50)
+
+
+class AttendanceMarker:
+    """
+    Merges recognitions from every camera of a session.
+
+    A student seen by any camera is marked PRESENT once; later sightings,
+    from the same or another camera, are dropped in memory without
+    touching the database. New PRESENT marks are buffered and written
+    together (write-behind) every `flush_interval` seconds or once
+    `flush_size` are pending; flush() writes them right away.
+
+    Live views read the present list from the database, where marks from
+    every process and manual edits end up; wait() lets them wake up as soon
+    as this process marks someone, and unwritten() shows marks still in the
+    buffer.
+    """
+
+    def __init__(self, session_id, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        self.session_id = session_id
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.flushes = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = set()
+        self._next_flush = time.monotonic() + flush_interval
+        self._marked = set(
+            AttendanceRecord.objects.filter(session_id=session_id, status="PRESENT")
+            .values_list("student_id", flat=True)
+        )
+        # Bumped on every new mark and every write, see wait().
+        self.version = 0
+        self._changed = threading.Condition(self._lock)
+        self.closed = False
+
+    def __contains__(self, student_id):
+        return student_id in self._marked
+
+    def mark(self, student_ids):
+        """
+        Mark students PRESENT. Returns the ids that were not marked before.
+        Called for every frame, so it also writes the buffer when due.
+        """
+        with self._lock:
+            new = set(student_ids) - self._marked
+            self._marked |= new
+            self._pending |= new
+            if new:
+                self.version += 1
+                self._changed.notify_all()
+            due = self._pending and (
+                len(self._pending) >= self.flush_size or time.monotonic() >= self._next_flush
+            )
+        if due:
+            try:
+                self.flush()
+            except Exception as e:
+                # Typically a locked database; the marks are retried on the next flush.
+                print(f"[WARN] Attendance flush for session {self.session_id} failed: {e}")
+        return new
+
+    def flush(self):
+        """Write every pending PRESENT mark in one transaction. Returns how many."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                self._next_flush = time.monotonic() + self.flush_interval
+            if not pending:
+                return 0
+            try:
+                # Writes only, no read first: SQLite cannot upgrade a read
+                # transaction to a write under contention, it fails as locked.
+                with transaction.atomic():
+                    AttendanceRecord.objects.filter(
+                        session_id=self.session_id, student_id__in=pending,
+                    ).exclude(status="PRESENT").update(status="PRESENT", updated_at=timezone.now())
+                    AttendanceRecord.objects.bulk_create(
+                        [
+                            AttendanceRecord(session_id=self.session_id, student_id=sid, status="PRESENT")
+                            for sid in pending
+                        ],
+                        batch_size=500,
+                        ignore_conflicts=True,
+                    )
+            except Exception:
+                # Keep the marks for the next flush rather than lose them.
+                with self._lock:
+                    self._pending |= pending
+                raise
+            self.flushes += 1
+            self.written += len(pending)
+            with self._changed:
+                self.version += 1
+                self._changed.notify_all()
+            return len(pending)
+
+    def unwritten(self):
+        """Ids marked PRESENT that are not in the database yet."""
+        with self._lock:
+            return set(self._pending)
+
+    def wait(self, version, timeout):
+        """
+        Wait up to `timeout` seconds for a mark or write after `version` (a
+        previous .version), or for close(). Returns the current version.
+        """
+        with self._changed:
+            if version == self.version and not self.closed:
+                self._changed.wait(timeout)
+            return self.version
+
+    def close(self):
+        """Wake up everyone in wait(); the session is over."""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def stats(self):
+        return {
+            "marked": len(self._marked),
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+_markers = {}
+_markers_lock = threading.Lock()
+
+
+def get_marker(session_id):
+    """The AttendanceMarker shared by all streams of a session."""
+    with _markers_lock:
+        marker = _markers.get(session_id)
+        if marker is None:
+            marker = _markers[session_id] = AttendanceMarker(session_id)
+        return marker
+
+
+def find_marker(session_id):
+    """The session's marker if this process has one, without creating it."""
+    with _markers_lock:
+        return _markers.get(session_id)
+
+
+def marker_stats(session_id):
+    marker = _markers.get(session_id)
+    return marker.stats() if marker is not None else None
+
+
+def drop_marker(session_id):
+    """
+    Write the session's pending marks and forget its marker. If the write
+    fails the marker stays registered with its marks (flush_all retries them
+    at exit) and the error is raised.
+    """
+    with _markers_lock:
+        marker = _markers.get(session_id)
+    if marker is None:
+        return
+    marker.flush()
+    with _markers_lock:
+        if _markers.get(session_id) is marker:
+            del _markers[session_id]
+    marker.close()
+
+
+@atexit.register
+def flush_all():
+    """Last chance for pending marks when the process exits."""
+    with _markers_lock:
+        markers = list(_markers.values())
+    for marker in markers:
+        try:
+            marker.flush()
+        except Exception as e:
+            print(f"[WARN] Could not write attendance of session {marker.session_id}: {e}")
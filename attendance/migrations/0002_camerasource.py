@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 12:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_teacher'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CameraSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('source', models.CharField(help_text='Device index (e.g. 0), video file path or stream URL', max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('classroom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cameras', to='students.classroom')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancesession',
+            name='cameras',
+            field=models.ManyToManyField(blank=True, related_name='sessions', to='attendance.camerasource'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_camerasource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camerasource',
+            name='detect_width',
+            field=models.PositiveIntegerField(blank=True, help_text='Width frames are downscaled to for face detection (default FACE_DETECT_WIDTH)', null=True),
+        ),
+        migrations.AddField(
+            model_name='camerasource',
+            name='max_face_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Largest face to detect, in camera pixels (default FACE_MAX_SIZE)', null=True),
+        ),
+        migrations.AddField(
+            model_name='camerasource',
+            name='min_face_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Smallest face to detect, in camera pixels (default FACE_MIN_SIZE)', null=True),
+        ),
+    ]
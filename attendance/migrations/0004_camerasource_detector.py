@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_camera_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camerasource',
+            name='detector',
+            field=models.CharField(blank=True, help_text='haar, yunet, ssd or deepface:<backend> (default FACE_DETECTOR)', max_length=50),
+        ),
+    ]
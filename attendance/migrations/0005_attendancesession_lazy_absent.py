@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_camerasource_detector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesession',
+            name='lazy_absent',
+            field=models.BooleanField(default=False, help_text='Only PRESENT rows are stored; the rest of the roster is absent'),
+        ),
+    ]
@@ -1,17 +1,78 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from students.models import Student, ClassRoom
 
+
+# Don't write ABSENT rows when a session starts; absence is derived from the roster.
+LAZY_ABSENT = getattr(settings, 'ATTENDANCE_LAZY_ABSENT', False)
+
+class CameraSource(models.Model):
+    """A camera a session can record from: device index, video file or stream URL."""
+    name = models.CharField(max_length=100)
+    source = models.CharField(max_length=500, help_text='Device index (e.g. 0), video file path or stream URL')
+    classroom = models.ForeignKey(ClassRoom, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='cameras')
+    is_active = models.BooleanField(default=True)
+    detect_width = models.PositiveIntegerField(null=True, blank=True,
+                                               help_text='Width frames are downscaled to for face detection (default FACE_DETECT_WIDTH)')
+    min_face_size = models.PositiveIntegerField(null=True, blank=True,
+                                                help_text='Smallest face to detect, in camera pixels (default FACE_MIN_SIZE)')
+    max_face_size = models.PositiveIntegerField(null=True, blank=True,
+                                                help_text='Largest face to detect, in camera pixels (default FACE_MAX_SIZE)')
+    detector = models.CharField(max_length=50, blank=True,
+                                help_text='haar, yunet, ssd or deepface:<backend> (default FACE_DETECTOR)')
+
+    def __str__(self):
+        return f'{self.name} ({self.source})'
+
+    def clean(self):
+        from .detection import DETECTORS
+        if self.detector and self.detector not in DETECTORS and not self.detector.startswith('deepface:'):
+            raise ValidationError({'detector': f'Unknown detector {self.detector!r}'})
+
+    def detect_options(self):
+        """Face detection settings of this camera, falling back to the global ones."""
+        from .detection import DetectOptions
+        defaults = DetectOptions()
+        return DetectOptions(
+            width=self.detect_width or defaults.width,
+            min_size=self.min_face_size or defaults.min_size,
+            max_size=self.max_face_size or defaults.max_size,
+            detector=self.detector or defaults.detector,
+        )
+
 class AttendanceSession(models.Model):
     classroom = models.ForeignKey(ClassRoom, on_delete=models.CASCADE)
     date = models.DateField(auto_now_add=True)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(blank=True, null=True)
     taken_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    cameras = models.ManyToManyField(CameraSource, blank=True, related_name='sessions')
+    lazy_absent = models.BooleanField(default=False,
+                                      help_text='Only PRESENT rows are stored; the rest of the roster is absent')
 
     def __str__(self):
         return f'{self.classroom} - {self.date}'
 
+    def camera_sources(self):
+        """Sources to record from; the default camera when none are attached."""
+        sources = list(self.cameras.order_by('id').values_list('source', flat=True))
+        return sources or [str(getattr(settings, 'ATTENDANCE_CAMERA_SOURCE', 0))]
+
+    def attendance_records(self):
+        """
+        Every student's record, in roster order. For lazy_absent sessions,
+        classroom students without a row are returned as unsaved ABSENT records.
+        """
+        records = list(self.records.select_related('student__classroom').order_by('id'))
+        if self.lazy_absent:
+            seen = {r.student_id for r in records}
+            roster = self.classroom.student_set.select_related('classroom').exclude(id__in=seen)
+            records += [AttendanceRecord(session=self, student=s, status='ABSENT') for s in roster]
+            records.sort(key=lambda r: r.student_id)
+        return records
+
 class AttendanceRecord(models.Model):
     STATUS_CHOICES = (
         ('PRESENT', 'Present'),
@@ -21,9 +82,13 @@ class AttendanceRecord(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ABSENT')
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Last status change; the cursor of the live present list (set it in
+    # queryset .update() / bulk_update() calls too, auto_now skips those).
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('session', 'student')
+        indexes = [models.Index(fields=['session', 'updated_at'])]
 
     def __str__(self):
         return f'{self.student} - {self.session} - {self.status}'
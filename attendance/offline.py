@@ -0,0 +1,169 @@
+# attendance/offline.py
+
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+from django.db import transaction
+from django.utils import timezone
+
+from .workers import WORKERS
+
+
+# Engine of a chunk worker process, created once by _init_worker.
+_engine = None
+
+
+def probe_video(path):
+    """Return (frame_count, fps) of a video file; frame_count is 0 when unknown."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    try:
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        return max(count, 0), fps
+    finally:
+        cap.release()
+
+
+def split_chunks(frame_count, chunks):
+    """Split [0, frame_count) into `chunks` contiguous (start, stop) ranges."""
+    if frame_count <= 0:
+        return [(0, None)]
+    chunks = max(1, min(chunks, frame_count))
+    bounds = [frame_count * i // chunks for i in range(chunks + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def scan_chunk(path, start, stop, every, classroom_id=None, engine=None):
+    """
+    Decode frames [start, stop) of a video and recognize every `every`-th.
+    Skipped frames are only grabbed, never converted. Returns
+    (sightings Counter of student id -> frames seen, frames decoded, frames recognized).
+    """
+    from .face_utils import FaceTracker, get_engine
+
+    engine = engine or _engine or get_engine()
+    tracker = FaceTracker()
+    sightings = Counter()
+    decoded = recognized = 0
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while stop is None or index < stop:
+            if not cap.grab():
+                break
+            decoded += 1
+            if (index - start) % every == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                results = engine.recognize(frame, classroom_id=classroom_id, tracker=tracker)
+                sightings.update({r.student_id for r in results if r.student_id is not None})
+                recognized += 1
+            index += 1
+    finally:
+        cap.release()
+    return sightings, decoded, recognized
+
+
+def _init_worker():
+    import django
+    django.setup()
+    from .face_utils import RecognitionEngine
+
+    global _engine
+    _engine = RecognitionEngine()
+
+
+def scan_video(path, every=15, workers=1, chunks=None, classroom_id=None, progress=None):
+    """
+    Recognize a video file in `chunks` pieces spread over `workers` processes
+    (in this process when workers is 1). `progress(done, total)` is called as
+    chunks finish. Returns a dict with the merged sightings and counters.
+    """
+    frame_count, fps = probe_video(path)
+    ranges = split_chunks(frame_count, chunks or workers * 4)
+
+    sightings = Counter()
+    decoded = recognized = 0
+    started = time.perf_counter()
+
+    def merge(result):
+        nonlocal decoded, recognized
+        chunk_sightings, chunk_decoded, chunk_recognized = result
+        sightings.update(chunk_sightings)
+        decoded += chunk_decoded
+        recognized += chunk_recognized
+
+    if workers <= 1:
+        for i, (start, stop) in enumerate(ranges, 1):
+            merge(scan_chunk(path, start, stop, every, classroom_id))
+            if progress:
+                progress(i, len(ranges))
+    else:
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(scan_chunk, path, start, stop, every, classroom_id)
+                for start, stop in ranges
+            ]
+            for i, future in enumerate(as_completed(futures), 1):
+                merge(future.result())
+                if progress:
+                    progress(i, len(ranges))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "sightings": sightings,
+        "frames": decoded,
+        "recognized_frames": recognized,
+        "chunks": len(ranges),
+        "fps": fps,
+        "video_seconds": decoded / fps if fps else None,
+        "elapsed": elapsed,
+    }
+
+
+def write_attendance(session, present_ids):
+    """
+    Record a session's attendance in bulk: PRESENT for `present_ids`, ABSENT
+    for the rest of the classroom (unless the session derives absence
+    lazily). Existing PRESENT records are never downgraded. Returns
+    (created, updated).
+    """
+    # Imported here: spawned chunk workers import this module before django.setup().
+    from .models import AttendanceRecord
+
+    present_ids = set(present_ids)
+    roster = set() if session.lazy_absent else set(session.classroom.student_set.values_list("id", flat=True))
+    with transaction.atomic():
+        existing = {r.student_id: r for r in session.records.select_for_update()}
+        new = [
+            AttendanceRecord(
+                session=session,
+                student_id=sid,
+                status="PRESENT" if sid in present_ids else "ABSENT",
+            )
+            for sid in (roster | present_ids) - existing.keys()
+        ]
+        changed = [r for sid, r in existing.items() if sid in present_ids and r.status != "PRESENT"]
+        now = timezone.now()
+        for record in changed:
+            record.status = "PRESENT"
+            record.updated_at = now
+        AttendanceRecord.objects.bulk_create(new, batch_size=500)
+        AttendanceRecord.objects.bulk_update(changed, ["status", "updated_at"], batch_size=500)
+    return len(new), len(changed)
+
+
+def default_workers():
+    """RECOGNITION_WORKERS if set, else one process per core."""
+    return WORKERS or os.cpu_count() or 1
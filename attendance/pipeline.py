@@ -0,0 +1,363 @@
+# attendance/pipeline.py
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .detection import DetectOptions
+from .face_utils import annotate_frame
+
+
+# Share of one core recognition may use, e.g. 0.5 = at most half a core.
+CPU_BUDGET = getattr(settings, "RECOGNITION_CPU_BUDGET", 0.5)
+# Alternatively, the maximum age in seconds of the boxes on screen; overrides the CPU budget.
+LATENCY_SLO = getattr(settings, "RECOGNITION_LATENCY_SLO", None)
+MAX_EVERY = getattr(settings, "RECOGNITION_MAX_EVERY", 30)
+# Recognitions that may run at once across all cameras when there is no worker pool.
+CAPACITY = getattr(settings, "RECOGNITION_CAPACITY", 1)
+# Seconds to wait for one frame's recognition before giving up on it.
+RESULT_TIMEOUT = getattr(settings, "RECOGNITION_RESULT_TIMEOUT", 30)
+
+
+class CadenceScheduler:
+    """
+    Decides how often recognition runs on the camera stream.
+
+    Recognition runs on every `every`-th frame. The cadence is recomputed
+    from smoothed measurements of recognition latency and camera frame
+    interval so that either recognition stays within `cpu_budget` of each
+    of the `workers` recognizing in parallel, or, when `latency_slo` is
+    set, results are never older than the SLO allows.
+    """
+
+    def __init__(self, cpu_budget=CPU_BUDGET, latency_slo=LATENCY_SLO,
+                 max_every=MAX_EVERY, smoothing=0.2, workers=1):
+        self.cpu_budget = cpu_budget
+        self.latency_slo = latency_slo
+        self.max_every = max_every
+        self.smoothing = smoothing
+        self.workers = workers
+
+        self.every = 1
+        self.latency = None
+        self.frame_interval = None
+        self._last_frame = None
+
+    def _ewma(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def frame_arrived(self):
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frame_interval = self._ewma(self.frame_interval, now - self._last_frame)
+        self._last_frame = now
+
+    def record_latency(self, seconds):
+        self.latency = self._ewma(self.latency, seconds)
+        self._adapt()
+
+    def _adapt(self):
+        if not self.latency or not self.frame_interval:
+            return
+        if self.latency_slo is not None:
+            # Boxes are at most (every * frame_interval + latency) old.
+            every = math.floor((self.latency_slo - self.latency) / self.frame_interval)
+        else:
+            every = math.ceil(self.latency / (self.cpu_budget * self.workers * self.frame_interval))
+        self.every = max(1, min(self.max_every, every))
+
+    def due(self, frame_index):
+        return frame_index % self.every == 0
+
+
+class RecognitionCapacity:
+    """
+    Shares a fixed number of recognition slots fairly between camera sources.
+
+    Each source that asked for a slot within the last `window` seconds is
+    active, and no source may hold more than its share,
+    ceil(capacity / active sources). Denied sources queue up, and a free
+    slot goes to the source that has waited longest, so a fast camera
+    cannot starve a slow one by always asking first.
+    """
+
+    def __init__(self, capacity=CAPACITY, window=1.0):
+        self.capacity = max(1, capacity)
+        self.window = window
+        self._in_use = {}
+        self._last_request = {}
+        self._waiting = {}
+        self._granted = {}
+        self._denied = {}
+        self._lock = threading.Lock()
+
+    def _active(self, now):
+        for key, last in list(self._last_request.items()):
+            if now - last > self.window and not self._in_use.get(key):
+                del self._last_request[key]
+                self._waiting.pop(key, None)
+        return len(self._last_request)
+
+    def try_acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._last_request[key] = now
+            share = math.ceil(self.capacity / self._active(now))
+            free = self.capacity - sum(self._in_use.values())
+            since = self._waiting.get(key, now)
+            ahead = sum(1 for k, t in self._waiting.items() if k != key and t < since)
+            if self._in_use.get(key, 0) >= share:
+                # Over its share: not owed a slot, so do not hold one back for it.
+                self._waiting.pop(key, None)
+            elif free > ahead:
+                self._waiting.pop(key, None)
+                self._in_use[key] = self._in_use.get(key, 0) + 1
+                self._granted[key] = self._granted.get(key, 0) + 1
+                return True
+            else:
+                self._waiting.setdefault(key, now)
+            self._denied[key] = self._denied.get(key, 0) + 1
+            return False
+
+    def release(self, key):
+        with self._lock:
+            if self._in_use.get(key, 0) > 0:
+                self._in_use[key] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "active_sources": self._active(time.monotonic()),
+                "in_use": {str(k): v for k, v in self._in_use.items() if v},
+                "granted": {str(k): v for k, v in self._granted.items()},
+                "denied": {str(k): v for k, v in self._denied.items()},
+            }
+
+
+_capacity = None
+_capacity_lock = threading.Lock()
+
+
+def get_capacity(pool=None):
+    """
+    Process-wide RecognitionCapacity: one slot per pool worker, or
+    RECOGNITION_CAPACITY slots for in-process recognition.
+    """
+    global _capacity
+    if _capacity is None:
+        with _capacity_lock:
+            if _capacity is None:
+                _capacity = RecognitionCapacity(pool.workers if pool is not None else CAPACITY)
+    return _capacity
+
+
+def _scaled_options(options, scale):
+    """Detection options for a frame resized by `scale`: face size limits shrink with it."""
+    options = options or DetectOptions()
+    return options._replace(
+        min_size=max(1, round(options.min_size * scale)) if options.min_size else None,
+        max_size=max(1, round(options.max_size * scale)) if options.max_size else None,
+    )
+
+
+class StreamPipeline:
+    """
+    Decouples the displayed stream from recognition.
+
+    Every camera frame is submitted and annotated with the latest known
+    boxes right away. Recognition runs off the streaming thread on the
+    frames the scheduler picks: in a single background thread, or on a
+    RecognitionPool of worker processes when one is given. When a frame is
+    due but no recognizer is free it is counted as backlog and skipped
+    rather than queued. Results are applied in frame order.
+
+    With a RecognitionCapacity, a due frame is only recognized when the
+    capacity grants `source_key` a slot, so several cameras share the
+    recognizers fairly; denied frames are counted as throttled.
+
+    The tracker is only used in-process; pool workers see frames out of
+    order and embed every face. Frames larger than the pool's slots are
+    sent downscaled and their boxes scaled back.
+    """
+
+    def __init__(self, engine, classroom_id=None, tracker=None, scheduler=None, pool=None,
+                 capacity=None, source_key=None, detect_options=None):
+        self.engine = engine
+        self.classroom_id = classroom_id
+        self.detect_options = detect_options
+        self.pool = pool
+        self.capacity = capacity
+        self.source_key = source_key
+        self.tracker = tracker if pool is None else None
+        self.max_in_flight = pool.workers if pool is not None else 1
+        self.scheduler = scheduler or CadenceScheduler(workers=self.max_in_flight)
+
+        self.latest_results = []
+        self.frames = 0
+        self.recognitions = 0
+        self.backlog = 0
+        self.throttled = 0
+        self._results_frame = 0
+        self._recognized = set()
+        self._in_flight = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=1) if pool is None else None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        """Offer a camera frame; it is recognized only if the scheduler says so."""
+        self.frames += 1
+        self.scheduler.frame_arrived()
+        if not self.scheduler.due(self.frames):
+            return
+        scale = 1.0
+        options = self.detect_options
+        if self.pool is not None:
+            # Frames too large for the pool's slots are recognized downscaled.
+            frame, scale = self.pool.fit(frame)
+            if scale < 1.0:
+                options = _scaled_options(options, scale)
+        with self._cond:
+            if len(self._in_flight) >= self.max_in_flight:
+                self.backlog += 1
+                return
+            if self.capacity is not None and not self.capacity.try_acquire(self.source_key):
+                self.throttled += 1
+                return
+            if self.pool is not None:
+                try:
+                    future = self.pool.submit(
+                        frame, classroom_id=self.classroom_id, block=False,
+                        detect_options=options,
+                    )
+                except Exception as e:
+                    print(f"[WARN] Recognition submit failed: {e}")
+                    future = None
+                if future is None:
+                    self._release()
+                    self.backlog += 1
+                    return
+            else:
+                future = self._executor.submit(
+                    self.engine.recognize, frame.copy(),
+                    classroom_id=self.classroom_id, tracker=self.tracker,
+                    detect_options=self.detect_options,
+                )
+            self._in_flight.append((self.frames, time.perf_counter(), future, scale))
+            self._cond.notify()
+
+    def _release(self):
+        if self.capacity is not None:
+            self.capacity.release(self.source_key)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._in_flight and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                frame_index, started, future, scale = self._in_flight[0]
+
+            # Wait on the oldest frame first so results land in order.
+            timed_out = False
+            try:
+                results = future.result(timeout=RESULT_TIMEOUT)
+                if scale < 1.0:
+                    results = [
+                        r._replace(box=tuple(int(round(v / scale)) for v in r.box)) for r in results
+                    ]
+            except FutureTimeout:
+                print(f"[WARN] Recognition of frame {frame_index} timed out after {RESULT_TIMEOUT}s")
+                results = self.latest_results
+                timed_out = True
+            except Exception as e:
+                print(f"[WARN] Recognition failed: {e}")
+                results = self.latest_results
+            if not timed_out:
+                # A lost frame says nothing about how long recognition takes.
+                self.scheduler.record_latency(time.perf_counter() - started)
+
+            with self._cond:
+                if self._closed:
+                    return
+                self._in_flight.popleft()
+                self._release()
+                self.latest_results = results
+                self._results_frame = frame_index
+                self._recognized.update(r.student_id for r in results if r.student_id is not None)
+                self.recognitions += 1
+
+    def annotate(self, frame):
+        return annotate_frame(frame, self.latest_results)
+
+    def drain_recognized(self):
+        """Student ids recognized since the last call."""
+        with self._cond:
+            recognized, self._recognized = self._recognized, set()
+        return recognized
+
+    def stats(self):
+        sched = self.scheduler
+        stats = {
+            "source": None if self.source_key is None else str(self.source_key),
+            "cadence": sched.every,
+            "cpu_budget": sched.cpu_budget,
+            "latency_slo": sched.latency_slo,
+            "recognition_ms": round(sched.latency * 1000, 1) if sched.latency else None,
+            "frame_ms": round(sched.frame_interval * 1000, 1) if sched.frame_interval else None,
+            "frames": self.frames,
+            "recognitions": self.recognitions,
+            "backlog": self.backlog,
+            "throttled": self.throttled,
+            "in_flight": len(self._in_flight),
+            "workers": self.max_in_flight,
+            "results_age_frames": self.frames - self._results_frame,
+        }
+        if self.tracker is not None:
+            stats.update(self.tracker.stats())
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        # Recognitions still running no longer count against this source.
+        with self._cond:
+            for _ in self._in_flight:
+                self._release()
+            self._in_flight.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def register_pipeline(session_id, pipeline):
+    with _pipelines_lock:
+        _pipelines.setdefault(session_id, []).append(pipeline)
+
+
+def unregister_pipeline(session_id, pipeline):
+    with _pipelines_lock:
+        running = _pipelines.get(session_id, [])
+        if pipeline in running:
+            running.remove(pipeline)
+        if not running:
+            _pipelines.pop(session_id, None)
+
+
+def pipeline_stats(session_id):
+    """Stats of every live stream of a session, for tuning."""
+    with _pipelines_lock:
+        return [p.stats() for p in _pipelines.get(session_id, [])]
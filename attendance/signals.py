@@ -0,0 +1,46 @@
+# attendance/signals.py
+
+import sys
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from students.models import Student
+
+
+def _face_utils():
+    """
+    attendance.face_utils if this process has loaded it, else None. Only a
+    loaded module can hold a running engine to update, and importing it
+    here would load DeepFace on the first student save.
+    """
+    return sys.modules.get("attendance.face_utils")
+
+
+@receiver(pre_save, sender=Student)
+def remember_old_classroom(sender, instance, **kwargs):
+    # Only needed to update a running engine.
+    if instance.pk and _face_utils() is not None:
+        instance._old_fields = (
+            Student.objects.filter(pk=instance.pk).values_list("classroom_id", "roll_no", "name").first()
+        )
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, **kwargs):
+    face_utils = _face_utils()
+    if face_utils is None:
+        return
+    old_fields = getattr(instance, "_old_fields", None)
+    old = old_fields[0] if old_fields else None
+    if created or old != instance.classroom_id:
+        face_utils.invalidate_classroom_galleries(*{c for c in (old, instance.classroom_id) if c is not None})
+    if old_fields and old_fields != (instance.classroom_id, instance.roll_no, instance.name):
+        face_utils.update_live_student(instance)
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    face_utils = _face_utils()
+    if face_utils is not None:
+        face_utils.invalidate_classroom_galleries(instance.classroom_id)
@@ -4,10 +4,12 @@ from django import template
 
 register = template.Library()
 
+# Records may be a queryset or the list from AttendanceSession.attendance_records().
+
 @register.filter
 def present_count(records):
-    return records.filter(status='PRESENT').count()
+    return sum(1 for r in records if r.status == 'PRESENT')
 
 @register.filter
 def absent_count(records):
-    return records.filter(status='ABSENT').count()
+    return sum(1 for r in records if r.status == 'ABSENT')
@@ -0,0 +1,82 @@
+# attendance/tests.py
+
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from students.models import ClassRoom, Student
+
+from . import face_utils
+from .face_utils import FaceTracker, RecognitionEngine
+
+
+class _StubModel:
+    input_shape = (160, 160)
+
+    def forward(self, batch):
+        return np.zeros((len(batch), 128), dtype=np.float32)
+
+
+class _StubDetector:
+    name = "stub"
+
+    def detect(self, frame, options=None):
+        return np.array([[10, 10, 60, 60], [100, 10, 60, 60]], dtype=np.int32)
+
+
+class RecognitionQueryTests(TestCase):
+    """Recognizing a frame must not touch the database (see check_recognition_queries)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        enc_dir = Path(tmp.name)
+        for patch in (
+            mock.patch.object(face_utils, "ENC_DIR", enc_dir),
+            mock.patch.object(face_utils, "STORE_DIR", enc_dir / "store"),
+            mock.patch.object(face_utils.DeepFace, "build_model", return_value=_StubModel()),
+            mock.patch.object(face_utils, "make_detector", return_value=_StubDetector()),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        classroom = ClassRoom.objects.create(name="Room 1")
+        self.students = [
+            Student.objects.create(roll_no=f"R{i}", name=f"Student {i}", classroom=classroom)
+            for i in range(2)
+        ]
+        self.classroom_id = classroom.id
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((2, 128)).astype(np.float32)
+        face_utils.get_store().put_many([s.id for s in self.students], self.vectors)
+
+        self.engine = RecognitionEngine()
+        # Each detected face embeds to one enrolled student's vector.
+        self.engine.embed = lambda frame, boxes: self.vectors[:len(boxes)]
+        self.frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    def assertRecognizesEveryone(self, results):
+        self.assertEqual(
+            [(r.student_id, r.name) for r in results],
+            [(s.id, s.name) for s in self.students],
+        )
+
+    def test_recognize_classroom_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            results = self.engine.recognize(self.frame, classroom_id=self.classroom_id)
+        self.assertRecognizesEveryone(results)
+
+    def test_recognize_whole_school_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            results = self.engine.recognize(self.frame)
+        self.assertRecognizesEveryone(results)
+
+    def test_recognize_with_tracker_makes_no_queries(self):
+        tracker = FaceTracker()
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                results = self.engine.recognize(self.frame, classroom_id=self.classroom_id, tracker=tracker)
+        self.assertRecognizesEveryone(results)
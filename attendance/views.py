@@ -1,58 +1,111 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import StreamingHttpResponse, JsonResponse
+from django.http import Http404, StreamingHttpResponse, JsonResponse
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 import cv2
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from students.models import ClassRoom, Student
-from .models import AttendanceSession, AttendanceRecord
-from .face_utils import load_known_faces, recognize_from_frame
+from .models import LAZY_ABSENT, AttendanceSession, AttendanceRecord, CameraSource
+from .broadcast import broadcast_stats, subscribe
+from .capture import get_capture
+from .face_utils import FaceTracker, get_engine
+from .marking import drop_marker, find_marker, get_marker, marker_stats
+from .pipeline import (
+    StreamPipeline, get_capacity, pipeline_stats, register_pipeline, unregister_pipeline,
+)
+from .workers import get_pool
 
 
-# One global camera instance (simple for dev)
-camera = cv2.VideoCapture(0)
+def gen_frames(session_id, source):
+    """
+    MJPEG stream of one camera of a session. Each source is opened by a
+    shared capture thread on first use and released when its last stream
+    closes; recognitions from all cameras are merged by the session marker.
+    """
+    session = AttendanceSession.objects.get(id=session_id)
+    camera = session.cameras.filter(source=source).first()
+    pool = get_pool()
+    # Engines pick up new enrollments themselves (RecognitionEngine.sync_gallery).
+    engine = get_engine() if pool is None else None
+    # Frames stream at camera rate; recognition runs in the background (or on
+    # the worker pool) on the frames the scheduler picks, within this
+    # source's share of the recognition capacity.
+    pipeline = StreamPipeline(
+        engine, classroom_id=session.classroom_id, tracker=FaceTracker(), pool=pool,
+        capacity=get_capacity(pool), source_key=source,
+        detect_options=camera.detect_options() if camera else None,
+    )
+    register_pipeline(session_id, pipeline)
+    marker = get_marker(session_id)
+    feed = get_capture(source).subscribe()
+    try:
+        while True:
+            success, frame = feed.read()
+            if not success:
+                break
 
+            pipeline.submit(frame)
+            frame = pipeline.annotate(frame)
+            marker.mark(pipeline.drain_recognized())
 
-def gen_frames(session_id):
-    known_encodings, known_ids = load_known_faces()
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-
-        student_ids, frame = recognize_from_frame(frame, known_encodings, known_ids)
-
-        for sid in student_ids:
-            student = Student.objects.get(id=sid)
-            record, created = AttendanceRecord.objects.get_or_create(
-                session_id=session_id,
-                student=student,
-                defaults={'status': 'PRESENT'},
+            ret, buffer = cv2.imencode('.jpg', frame)
+            frame_bytes = buffer.tobytes()
+            yield (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
             )
-            if not created and record.status != 'PRESENT':
-                record.status = 'PRESENT'
-                record.save(update_fields=['status'])
-
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
-        )
+    finally:
+        feed.close()
+        pipeline.close()
+        try:
+            marker.mark(pipeline.drain_recognized())
+            # The viewer is gone; don't leave this stream's marks in the buffer.
+            marker.flush()
+        except Exception as e:
+            # Still pending in the marker; written by its next flush or at exit.
+            print(f"[WARN] Attendance flush for session {session_id} failed: {e}")
+        finally:
+            unregister_pipeline(session_id, pipeline)
+            print(f"[PIPELINE] Session {session_id}, source {source!r}: {pipeline.stats()}")
+
+
+def watch_camera(session_id, source):
+    """
+    Subscribe to the shared broadcast of one camera of a session:
+    gen_frames runs once per camera however many viewers are watching it.
+    """
+    return subscribe((session_id, source), lambda: gen_frames(session_id, source))
+
+
 @login_required
 def start_attendance(request, classroom_id):
     classroom = get_object_or_404(ClassRoom, id=classroom_id)
-    session = AttendanceSession.objects.create(
-        classroom=classroom,
-        taken_by=request.user,
-    )
-    # pre-create ABSENT records for all students in the class
-    for student in Student.objects.filter(classroom=classroom):
-        AttendanceRecord.objects.get_or_create(
-            session=session,
-            student=student,
-            defaults={"status": "ABSENT"},
+    with transaction.atomic():
+        session = AttendanceSession.objects.create(
+            classroom=classroom,
+            taken_by=request.user,
+            lazy_absent=LAZY_ABSENT,
         )
+        session.cameras.set(CameraSource.objects.filter(classroom=classroom, is_active=True))
+        if not session.lazy_absent:
+            # pre-create ABSENT records for all students in the class
+            AttendanceRecord.objects.bulk_create(
+                [
+                    AttendanceRecord(session=session, student_id=sid, status="ABSENT")
+                    for sid in Student.objects.filter(classroom=classroom).values_list("id", flat=True)
+                ],
+                batch_size=500,
+            )
     print(f"[SESSION START] Session {session.id} for classroom {classroom.id}")
     return redirect("attendance:take_attendance", session_id=session.id)
 
@@ -60,12 +113,20 @@ def start_attendance(request, classroom_id):
 @login_required
 def take_attendance(request, session_id):
     session = get_object_or_404(AttendanceSession, id=session_id)
-    return render(request, "attendance/take_attendance.html", {"session": session})
+    return render(
+        request,
+        "attendance/take_attendance.html",
+        {"session": session, "cameras": session.camera_sources()},
+    )
 
 
-def video_feed(request, session_id):
+def video_feed(request, session_id, camera=0):
+    session = get_object_or_404(AttendanceSession, id=session_id)
+    sources = session.camera_sources()
+    if camera >= len(sources):
+        raise Http404("No such camera in this session")
     return StreamingHttpResponse(
-        gen_frames(session_id),
+        watch_camera(session_id, sources[camera]).frames(),
         content_type="multipart/x-mixed-replace; boundary=frame",
     )
 
@@ -73,6 +134,13 @@ def video_feed(request, session_id):
 @login_required
 def end_attendance(request, session_id):
     session = get_object_or_404(AttendanceSession, id=session_id)
+    try:
+        # Marks first: the session only ends once its attendance is written.
+        drop_marker(session.id)
+    except Exception as e:
+        print(f"[WARN] Could not write attendance of session {session.id}: {e}")
+        messages.error(request, "Attendance could not be saved yet, please try ending the session again.")
+        return redirect("attendance:take_attendance", session_id=session.id)
     session.end_time = timezone.now()
     session.save()
     return redirect("attendance:attendance_detail", session_id=session.id)
@@ -81,7 +149,7 @@ def end_attendance(request, session_id):
 @login_required
 def attendance_detail(request, session_id):
     session = get_object_or_404(AttendanceSession, id=session_id)
-    records = session.records.select_related("student").all()
+    records = session.attendance_records()
     return render(
         request,
         "attendance/attendance_list.html",
@@ -100,7 +168,119 @@ def update_record_status(request, record_id):
     return JsonResponse({"success": False}, status=400)
 
 
+# Seconds between keep-alive comments on an idle present-students event stream.
+EVENT_KEEPALIVE = getattr(settings, "ATTENDANCE_EVENT_KEEPALIVE", 15)
+# Seconds between database checks of an event stream, for changes this process doesn't see.
+EVENT_POLL_INTERVAL = getattr(settings, "ATTENDANCE_EVENT_POLL_INTERVAL", 2)
+# Rows changed up to this many seconds before the cursor are checked again, in
+# case their write committed after a newer one (e.g. from another process).
+EVENT_REPLAY_WINDOW = getattr(settings, "ATTENDANCE_EVENT_REPLAY_WINDOW", 10)
+
+
+def _event_id(when):
+    return int(when.timestamp() * 1_000_000)
+
+
+def _present_events(session, since):
+    """
+    Server-sent events for a session's present list, read from the
+    database: a "present" (or, after a manual change, "absent") event per
+    changed record, with the change time in microseconds as event id, and
+    an "end" event once the session is over. Marks this process has not
+    written yet are pushed right away, without an id.
+    """
+    cursor = since
+    sent = {}  # record id -> event id of the change already sent
+    pushed = set()  # students sent as present
+    last_write = time.monotonic()
+
+    def event(name, data, event_id=None):
+        nonlocal last_write
+        last_write = time.monotonic()
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{head}event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    marker = None
+    yield "retry: 3000\n\n"
+    while True:
+        # The last marker seen is kept: drop_marker() unregisters it before closing it.
+        marker = find_marker(session.id) or marker
+        version = marker.version if marker is not None else None
+        # Checked before reading the rows, so the last read sees the final writes.
+        ended = (marker is not None and marker.closed) or (
+            AttendanceSession.objects.filter(id=session.id, end_time__isnull=False).exists()
+        )
+
+        rows = AttendanceRecord.objects.filter(session_id=session.id)
+        if cursor:
+            changed_after = datetime.fromtimestamp(cursor / 1_000_000, tz=dt_timezone.utc)
+            rows = rows.filter(updated_at__gte=changed_after - timedelta(seconds=EVENT_REPLAY_WINDOW))
+        for row in rows.order_by("updated_at", "id").values(
+            "id", "student_id", "status", "updated_at", "student__roll_no", "student__name",
+        ):
+            stamp = _event_id(row["updated_at"])
+            if sent.get(row["id"]) == stamp:
+                continue
+            sent[row["id"]] = stamp
+            cursor = max(cursor, stamp)
+            student = {"id": row["student_id"], "roll_no": row["student__roll_no"], "name": row["student__name"]}
+            if row["status"] == "PRESENT":
+                pushed.add(row["student_id"])
+                yield event("present", student, cursor)
+            elif since or row["student_id"] in pushed:
+                # A fresh stream has nothing to take back.
+                pushed.discard(row["student_id"])
+                yield event("absent", student, cursor)
+
+        if ended:
+            yield event("end", {})
+            return
+
+        unwritten = marker.unwritten() - pushed if marker is not None else set()
+        if unwritten:
+            for student in Student.objects.filter(id__in=unwritten).values("id", "roll_no", "name"):
+                pushed.add(student["id"])
+                yield event("present", student)
+
+        if time.monotonic() - last_write >= EVENT_KEEPALIVE:
+            last_write = time.monotonic()
+            yield ": keep-alive\n\n"
+        if marker is not None:
+            marker.wait(version, EVENT_POLL_INTERVAL)
+        else:
+            time.sleep(EVENT_POLL_INTERVAL)
+
+
 @login_required
+def present_events(request, session_id):
+    """
+    Push feed of the session's present list (text/event-stream).
+    Reconnecting browsers send Last-Event-ID and get the changes since.
+    """
+    session = get_object_or_404(AttendanceSession, id=session_id)
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.GET.get("since") or 0)
+    except ValueError:
+        since = 0
+    response = StreamingHttpResponse(_present_events(session, max(since, 0)), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Don't let a reverse proxy hold events back.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _session_status_etag(request, session_id):
+    # Ids of the PRESENT rows change whenever the list does; no join needed.
+    ids = (
+        AttendanceRecord.objects.filter(session_id=session_id, status="PRESENT")
+        .order_by("id").values_list("id", flat=True)
+    )
+    return hashlib.md5(",".join(map(str, ids)).encode()).hexdigest()
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_session_status_etag)
 def session_status(request, session_id):
     records = (
         AttendanceRecord.objects.filter(session_id=session_id, status="PRESENT")
@@ -117,47 +297,46 @@ def session_status(request, session_id):
     return JsonResponse({"present_students": data})
 
 
+@login_required
+def stream_stats(request, session_id):
+    """Recognition cadence and backlog of the session's live streams, for tuning."""
+    return JsonResponse({
+        "streams": pipeline_stats(session_id),
+        "capacity": get_capacity(get_pool()).stats(),
+        "marker": marker_stats(session_id),
+        "broadcasts": broadcast_stats(session_id),
+    })
+
+
 @login_required
 def session_report_list(request):
+    roster_size = (
+        Student.objects.filter(classroom_id=OuterRef("classroom_id"))
+        .order_by().values("classroom_id").annotate(n=Count("id")).values("n")
+    )
     sessions = (
         AttendanceSession.objects.select_related("classroom", "taken_by")
+        .annotate(
+            record_count=Count("records"),
+            roster_records=Count("records", filter=Q(records__student__classroom_id=F("classroom_id"))),
+            roster_size=Coalesce(Subquery(roster_size), 0),
+        )
         .order_by("-date", "-start_time")
     )
+    for session in sessions:
+        # Lazy sessions only store PRESENT rows; the rest of the roster counts too.
+        session.student_count = session.record_count + (
+            session.roster_size - session.roster_records if session.lazy_absent else 0
+        )
     return render(request, "attendance/report_list.html", {"sessions": sessions})
 
 
 @login_required
 def session_report_detail(request, session_id):
     session = get_object_or_404(AttendanceSession, id=session_id)
-    records = session.records.select_related("student").all()
+    records = session.attendance_records()
     return render(
         request,
         "attendance/report.html",
         {"session": session, "records": records},
     )
-def gen_frames(session_id):
-    known_encodings, known_ids = load_known_faces()
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-
-        student_ids, frame = recognize_from_frame(frame, known_encodings, known_ids)
-
-        for sid in student_ids:
-            student = Student.objects.get(id=sid)
-            record, created = AttendanceRecord.objects.get_or_create(
-                session_id=session_id,
-                student=student,
-                defaults={'status': 'PRESENT'},
-            )
-            if not created and record.status != 'PRESENT':
-                record.status = 'PRESENT'
-                record.save(update_fields=['status'])
-
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (
-            b'--frame\r\n'
-            b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n'
-        )
\ No newline at end of file
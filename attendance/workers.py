@@ -0,0 +1,313 @@
+# attendance/workers.py
+
+import itertools
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import connection as mp_connection, shared_memory
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+
+# Worker processes for recognition; 0 keeps recognition in the web process.
+WORKERS = getattr(settings, "RECOGNITION_WORKERS", 0)
+# Largest frame a shared-memory slot can hold (default: one 1080p BGR frame); larger
+# frames are downscaled to fit before recognition (see RecognitionPool.fit).
+MAX_FRAME_BYTES = getattr(settings, "RECOGNITION_MAX_FRAME_BYTES", 1920 * 1080 * 3)
+# Seconds the collector waits for results before checking on the workers again.
+WATCH_INTERVAL = getattr(settings, "RECOGNITION_WATCH_INTERVAL", 1.0)
+
+
+def _worker_main(tasks, results, slot_names):
+    """
+    Entry point of a worker process. Holds its own RecognitionEngine and reads
+    frames straight out of the shared-memory slots named in each task.
+    """
+    import django
+    django.setup()
+    from attendance.face_utils import RecognitionEngine
+
+    try:
+        engine = RecognitionEngine()
+    except Exception as e:
+        results.send(("failed", os.getpid(), f"{type(e).__name__}: {e}"))
+        raise
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    results.send(("ready", os.getpid(), None))
+
+    try:
+        while True:
+            try:
+                task = tasks.recv()
+            except EOFError:
+                break  # the pool is gone
+            if task is None:
+                break
+            seq, slot, shape, dtype, classroom_id, detect_options = task
+            frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=slots[slot].buf)
+            try:
+                faces = engine.recognize(frame, classroom_id=classroom_id, detect_options=detect_options)
+                payload = [
+                    (tuple(int(v) for v in r.box), r.student_id, r.name, r.distance)
+                    for r in faces
+                ]
+                results.send((seq, payload, None))
+            except Exception as e:
+                results.send((seq, None, f"{type(e).__name__}: {e}"))
+            finally:
+                del frame
+    finally:
+        for shm in slots:
+            shm.close()
+
+
+class _Worker:
+    """A worker process with its own task and result pipes."""
+
+    def __init__(self, ctx, slot_names):
+        task_reader, self.tasks = ctx.Pipe(duplex=False)
+        self.results, result_writer = ctx.Pipe(duplex=False)
+        self.proc = ctx.Process(target=_worker_main, args=(task_reader, result_writer, slot_names), daemon=True)
+        self.proc.start()
+        # Only the child's copies stay open, so its death reads as EOF here.
+        task_reader.close()
+        result_writer.close()
+        self.pending = set()  # seqs sent to this worker and not answered yet
+        self.started = False
+        self.dead = False
+
+
+class RecognitionPool:
+    """
+    Pool of worker processes that each hold a loaded model.
+
+    Frames are copied once into a fixed set of shared-memory slots and only
+    the slot number travels to a worker, so no frame is ever pickled. Each
+    frame goes to the least busy worker over that worker's own pipe.
+    submit() returns a Future of FaceResult lists; callers that wait on
+    their futures in submission order get results back in order.
+
+    A worker that dies (crash, OOM kill) fails the frames it was given and
+    frees their slots; it is restarted unless it never got its model
+    loaded. With no worker left every pending frame fails and submit()
+    raises RuntimeError.
+    """
+
+    def __init__(self, workers=None, max_frame_bytes=MAX_FRAME_BYTES, slots_per_worker=2):
+        self.workers = workers or WORKERS or os.cpu_count() or 1
+        self.max_frame_bytes = max_frame_bytes
+
+        self._ctx = mp.get_context("spawn")
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=max_frame_bytes)
+            for _ in range(self.workers * slots_per_worker)
+        ]
+        self._free = queue.Queue()
+        for i in range(len(self._slots)):
+            self._free.put(i)
+
+        self._futures = {}  # seq -> (future, slot, worker)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._startup_failures = 0
+        self._closing = False
+        self.failed = None
+
+        self._slot_names = [shm.name for shm in self._slots]
+        self._workers = [_Worker(self._ctx, self._slot_names) for _ in range(self.workers)]
+
+        self._ready = threading.Semaphore(0)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its model (False if one could not)."""
+        for _ in range(self.workers):
+            if not self._ready.acquire(timeout=timeout):
+                return False
+        return not self._startup_failures
+
+    def _fail(self, seqs, error):
+        for seq in seqs:
+            with self._lock:
+                entry = self._futures.pop(seq, None)
+            if entry is not None:
+                future, slot, worker = entry
+                worker.pending.discard(seq)
+                self._free.put(slot)
+                future.set_exception(RuntimeError(error))
+
+    def _handle(self, worker, msg, FaceResult):
+        seq, payload, error = msg
+        if seq == "ready":
+            print(f"[WORKER] Recognition worker {payload} ready")
+            worker.started = True
+            self._ready.release()
+            return
+        if seq == "failed":
+            print(f"[WORKER] Recognition worker {payload} could not start: {error}")
+            return
+
+        with self._lock:
+            entry = self._futures.pop(seq, None)
+            worker.pending.discard(seq)
+        if entry is None:
+            return
+        future, slot, _ = entry
+        self._free.put(slot)
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result([FaceResult(*r) for r in payload])
+
+    def _worker_died(self, worker, FaceResult):
+        # Results it sent before dying still count.
+        try:
+            while worker.results.poll():
+                self._handle(worker, worker.results.recv(), FaceResult)
+        except (EOFError, OSError):
+            pass
+        worker.proc.join(timeout=1)
+        error = f"Recognition worker {worker.proc.pid} died (exit code {worker.proc.exitcode})"
+        print(f"[WORKER] {error}")
+        # Never loaded its model; restarting would fail the same way.
+        replacement = _Worker(self._ctx, self._slot_names) if worker.started else None
+        with self._lock:
+            worker.dead = True
+            self._workers.remove(worker)
+            if replacement is not None:
+                self._workers.append(replacement)
+            orphaned = list(worker.pending)
+            if not self._workers:
+                self.failed = "No recognition worker is running"
+                orphaned = list(self._futures)
+        worker.tasks.close()
+        worker.results.close()
+        if not worker.started:
+            self._startup_failures += 1
+            self._ready.release()
+        self._fail(orphaned, self.failed or error)
+        if self.failed:
+            print(f"[WORKER] {self.failed}")
+
+    def _collect(self):
+        from .face_utils import FaceResult
+
+        while not self._closing and not self.failed:
+            with self._lock:
+                workers = list(self._workers)
+            waiting = {}
+            for worker in workers:
+                waiting[worker.results] = worker
+                waiting[worker.proc.sentinel] = worker
+            for ready in mp_connection.wait(list(waiting), timeout=WATCH_INTERVAL):
+                worker = waiting[ready]
+                if worker.dead or self._closing:
+                    continue
+                if ready is worker.results:
+                    try:
+                        msg = worker.results.recv()
+                    except (EOFError, OSError):
+                        self._worker_died(worker, FaceResult)
+                        continue
+                    self._handle(worker, msg, FaceResult)
+                else:
+                    self._worker_died(worker, FaceResult)
+
+    def fit(self, frame):
+        """
+        The frame downscaled to fit a shared memory slot if it is larger
+        than RECOGNITION_MAX_FRAME_BYTES (e.g. 4K cameras), and the factor
+        it was resized by.
+        """
+        if frame.nbytes <= self.max_frame_bytes:
+            return frame, 1.0
+        scale = math.sqrt(self.max_frame_bytes / frame.nbytes)
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), size[0] / w
+
+    def submit(self, frame, classroom_id=None, block=True, timeout=None, detect_options=None):
+        """
+        Queue a frame for recognition. Returns a Future, or None when
+        `block` is False and every slot is busy. Raises RuntimeError when
+        no worker is left.
+        """
+        if self.failed:
+            raise RuntimeError(self.failed)
+        if frame.nbytes > self.max_frame_bytes:
+            raise ValueError(
+                f"Frame of {frame.nbytes} bytes exceeds RECOGNITION_MAX_FRAME_BYTES ({self.max_frame_bytes})"
+            )
+        try:
+            slot = self._free.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None
+
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._slots[slot].buf)
+        view[...] = frame
+        del view
+
+        future = Future()
+        seq = next(self._seq)
+        task = (seq, slot, frame.shape, frame.dtype.str, classroom_id, detect_options)
+        with self._lock:
+            live = [w for w in self._workers if not w.dead]
+            if not live:
+                self._free.put(slot)
+                raise RuntimeError(self.failed or "No recognition worker is running")
+            worker = min(live, key=lambda w: len(w.pending))
+            worker.pending.add(seq)
+            self._futures[seq] = (future, slot, worker)
+            try:
+                worker.tasks.send(task)
+                sent = True
+            except OSError:
+                sent = False  # died just now; the collector restarts it
+        if not sent:
+            self._fail([seq], f"Recognition worker {worker.proc.pid} is gone")
+        return future
+
+    def close(self):
+        self._closing = True
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                worker.tasks.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.proc.join(timeout=10)
+            if worker.proc.is_alive():
+                worker.proc.terminate()
+        self._collector.join(timeout=WATCH_INTERVAL + 5)
+        for worker in workers:
+            worker.tasks.close()
+            worker.results.close()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Process-wide RecognitionPool when RECOGNITION_WORKERS > 0, else None.
+    """
+    global _pool
+    if WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RecognitionPool(WORKERS)
+    return _pool
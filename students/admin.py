@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import ClassRoom, Student, StudentImage
+from .models import ClassRoom, Student, StudentImage, EnrollmentJob
 
 admin.site.register(ClassRoom)
 admin.site.register(Student)
-admin.site.register(StudentImage)
\ No newline at end of file
+admin.site.register(StudentImage)
+admin.site.register(EnrollmentJob)
@@ -0,0 +1,121 @@
+# students/bulk.py
+
+import csv
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+
+# Detector and model of a bulk-enrollment worker process, set by _init_worker.
+_detector = None
+_model = None
+
+
+def read_roster(csv_path):
+    """
+    Rows of a roster CSV with columns roll_no, name, classroom, photo.
+    Returns (rows, errors) where errors are (line, reason) pairs.
+    """
+    rows, errors, seen = [], [], set()
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"roll_no", "name", "classroom", "photo"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+        for line, row in enumerate(reader, start=2):
+            row = {k: (row.get(k) or "").strip() for k in ("roll_no", "name", "classroom", "photo")}
+            if not all(row.values()):
+                errors.append((line, "empty field"))
+            elif row["roll_no"] in seen:
+                errors.append((line, f"duplicate roll_no {row['roll_no']}"))
+            else:
+                seen.add(row["roll_no"])
+                rows.append(row)
+    return rows, errors
+
+
+def _init_worker():
+    import django
+    django.setup()
+    import cv2
+    from deepface import DeepFace
+    from attendance.detection import CASCADE_PATH
+    from attendance.face_utils import MODEL_NAME
+
+    global _detector, _model
+    _detector = cv2.CascadeClassifier(CASCADE_PATH)
+    _model = DeepFace.build_model(MODEL_NAME)
+
+
+def _largest_face(image):
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = _detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+    if len(faces) == 0:
+        # Like enforce_detection=False: a portrait without a detection is used whole.
+        h, w = image.shape[:2]
+        return (0, 0, w, h)
+    return tuple(max(faces, key=lambda b: b[2] * b[3]))
+
+
+def embed_batch(items, batch_size):
+    """
+    Embed one batch of (student_id, photo_path) in a worker process:
+    one detection per photo, then batched forward passes. Returns
+    (ids, embeddings, failures) with failures as (student_id, reason).
+    """
+    import cv2
+    from attendance.face_utils import preprocess_faces
+
+    ids, faces, failures = [], [], []
+    for sid, path in items:
+        image = cv2.imread(path)
+        if image is None:
+            failures.append((sid, f"cannot read image {path}"))
+            continue
+        faces.append(preprocess_faces(image, [_largest_face(image)], _model.input_shape)[0])
+        ids.append(sid)
+
+    if not ids:
+        return [], np.empty((0, _model.output_shape), dtype=np.float32), failures
+
+    faces = np.stack(faces)
+    out = []
+    for start in range(0, len(faces), batch_size):
+        result = _model.forward(faces[start:start + batch_size])
+        out.append(np.asarray(result, dtype=np.float32).reshape(-1, _model.output_shape))
+    return ids, np.concatenate(out), failures
+
+
+def embed_students(items, workers, batch_size, on_batch):
+    """
+    Embed (student_id, photo_path) pairs on `workers` processes, `batch_size`
+    photos per task. on_batch(ids, embeddings, failures) is called in this
+    process as each batch finishes, so results can be saved incrementally.
+    """
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    if not batches:
+        return
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {pool.submit(embed_batch, batch, batch_size): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                on_batch(*future.result())
+            except Exception as e:
+                on_batch([], None, [(sid, f"{type(e).__name__}: {e}") for sid, _ in futures[future]])
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def resolve_photo(photo_dir, photo):
+    path = Path(photo)
+    if not path.is_absolute() and photo_dir:
+        path = Path(photo_dir) / path
+    return path
@@ -1,11 +1,23 @@
 # students/encoding_utils.py
 
-from attendance.face_utils import build_embedding_for_student
+# face_utils imports DeepFace (and TensorFlow); it is only loaded by the
+# code paths that actually need it, never by simply saving a student.
 
 
 def create_encodings_for_student(student):
     """
     Build DeepFace embeddings for a student's main photo.
-    Called after saving a student with a photo.
+    Runs in the enrollment worker; raises ValueError when no embedding could be built.
     """
+    from attendance.face_utils import build_embedding_for_student
     build_embedding_for_student(student)
+
+
+def remove_encodings_for_student(student_id):
+    """
+    Drop a deleted student from the embedding store and the running
+    recognition gallery.
+    """
+    from attendance.face_utils import get_store, update_live_gallery
+    get_store().delete(student_id)
+    update_live_gallery(student_id)
@@ -0,0 +1,161 @@
+# students/enrollment.py
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EnrollmentJob, Student
+
+
+# Attempts before a job is marked FAILED.
+MAX_ATTEMPTS = getattr(settings, "ENROLLMENT_MAX_ATTEMPTS", 3)
+# Delay before the first retry, doubled on every further attempt.
+RETRY_DELAY = getattr(settings, "ENROLLMENT_RETRY_DELAY", 30)
+# A RUNNING job older than this (seconds) belongs to a crashed worker and is requeued.
+JOB_TIMEOUT = getattr(settings, "ENROLLMENT_JOB_TIMEOUT", 600)
+# Run jobs on a thread of the web process instead of `manage.py enrollment_worker`.
+IN_PROCESS = getattr(settings, "ENROLLMENT_IN_PROCESS", False)
+
+
+def enqueue_enrollment(student):
+    """
+    Queue building a student's embedding and return the job right away.
+    A job still waiting for the same student is reused rather than duplicated.
+    """
+    with transaction.atomic():
+        job = EnrollmentJob.objects.filter(student=student, status="PENDING").first()
+        if job is None:
+            job = EnrollmentJob.objects.create(student=student)
+        else:
+            job.attempts = 0
+            job.error = ""
+            job.run_after = timezone.now()
+            job.save(update_fields=["attempts", "error", "run_after", "updated_at"])
+    print(f"[ENROLL] Queued job {job.id} for student {student.id}")
+    if IN_PROCESS:
+        transaction.on_commit(_wake_in_process_worker)
+    return job
+
+
+def requeue_stale_jobs():
+    """Put back jobs left RUNNING by a worker that died mid-job."""
+    cutoff = timezone.now() - timedelta(seconds=JOB_TIMEOUT)
+    return EnrollmentJob.objects.filter(status="RUNNING", updated_at__lt=cutoff).update(
+        status="PENDING", run_after=timezone.now(), updated_at=timezone.now()
+    )
+
+
+def claim_job():
+    """
+    Atomically take the oldest due PENDING job, or return None. The
+    conditional UPDATE makes this safe with several workers.
+    """
+    now = timezone.now()
+    while True:
+        job = (
+            EnrollmentJob.objects.filter(status="PENDING", run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = EnrollmentJob.objects.filter(pk=job.pk, status="PENDING").update(
+            status="RUNNING", attempts=F("attempts") + 1, updated_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Build the embedding for a claimed job and record the outcome."""
+    from .encoding_utils import create_encodings_for_student
+
+    try:
+        student = job.student
+    except Student.DoesNotExist:
+        # Deleted after the job was claimed; the job row went with them.
+        EnrollmentJob.objects.filter(pk=job.pk).delete()
+        print(f"[ENROLL] Job {job.id} dropped: student {job.student_id} no longer exists")
+        return job
+
+    try:
+        create_encodings_for_student(student)
+    except Exception as e:
+        job.error = str(e) or type(e).__name__
+        if job.attempts < MAX_ATTEMPTS:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status = "PENDING"
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            print(f"[ENROLL] Job {job.id} failed ({job.error}); retry {job.attempts + 1} in {delay}s")
+        else:
+            job.status = "FAILED"
+            print(f"[ENROLL] Job {job.id} failed after {job.attempts} attempts: {job.error}")
+    else:
+        job.status = "DONE"
+        job.error = ""
+        print(f"[ENROLL] Job {job.id} done for student {job.student_id}")
+    # An UPDATE rather than save(): the job is gone if the student was
+    # deleted meanwhile, and there is nothing left to record.
+    updated = EnrollmentJob.objects.filter(pk=job.pk).update(
+        status=job.status, error=job.error, run_after=job.run_after, updated_at=timezone.now()
+    )
+    if not updated:
+        print(f"[ENROLL] Job {job.id} was deleted while running")
+    return job
+
+
+def run_pending(limit=None):
+    """Run due jobs until none are left (or `limit` ran). Returns the number run."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+def run_worker(poll_interval=2.0, stop=None):
+    """Process jobs forever, polling the table when the queue is empty."""
+    print("[ENROLL] Worker started")
+    while stop is None or not stop.is_set():
+        try:
+            requeue_stale_jobs()
+            done = run_pending()
+        except Exception as e:
+            # A job left RUNNING here is requeued once it goes stale.
+            print(f"[ENROLL] Worker error: {e}")
+            done = 0
+        if not done:
+            time.sleep(poll_interval)
+
+
+_wake = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _in_process_loop():
+    while True:
+        _wake.wait(timeout=RETRY_DELAY)
+        _wake.clear()
+        try:
+            run_pending()
+        except Exception as e:
+            print(f"[ENROLL] In-process worker error: {e}")
+
+
+def _wake_in_process_worker():
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_in_process_loop, daemon=True)
+            _thread.start()
+    _wake.set()
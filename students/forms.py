@@ -37,8 +37,37 @@ class TeacherForm(forms.ModelForm):
             self.fields['email'].initial = instance.user.email
             self.fields['username'].initial = instance.user.username
 
+class MultipleFileInput(forms.FileInput):
+    """File input that submits every selected file"""
+    allow_multiple_selected = True
+
+    def __init__(self, attrs=None):
+        super().__init__({**(attrs or {}), 'multiple': True})
+
+    def value_from_datadict(self, data, files, name):
+        return files.getlist(name)
+
+
+class MultipleImageField(forms.ImageField):
+    """Image field that accepts several files at once"""
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput(attrs={'class': 'form-control'}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_clean(d, initial) for d in data]
+        return [single_clean(data, initial)] if data else []
+
+
 class StudentForm(forms.ModelForm):
     """Form to add/edit students"""
+    extra_images = MultipleImageField(
+        required=False, label='More Photos',
+        help_text='Optional: more face photos (other angles, lighting) to improve recognition',
+    )
+
     class Meta:
         model = Student
         fields = ['roll_no', 'name', 'classroom', 'photo']
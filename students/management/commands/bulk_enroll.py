@@ -0,0 +1,149 @@
+# students/management/commands/bulk_enroll.py
+
+import time
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.embedding_cache import file_digest
+from attendance.face_utils import EMBED_BATCH_SIZE, EMBED_CACHE, get_embedding_cache, get_store
+from students.bulk import default_workers, embed_students, read_roster, resolve_photo
+from students.models import ClassRoom, EnrollmentJob, Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Enroll a whole cohort from a CSV (roll_no, name, classroom, photo). "
+        "Safe to re-run: existing students and embeddings are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv")
+        parser.add_argument("--photo-dir", default=None,
+                            help="Directory that relative photo paths in the CSV are read from.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Embedding processes (default: one per core).")
+        parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                            help="Photos per worker task and forward pass.")
+        parser.add_argument("--reembed", action="store_true",
+                            help="Recompute embeddings of students that already have one.")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        try:
+            rows, errors = read_roster(opts["csv"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        failures = [f"line {line}: {reason}" for line, reason in errors]
+
+        classrooms = self._classrooms({r["classroom"] for r in rows})
+        created, skipped = self._create_students(rows, classrooms, opts["photo_dir"], failures)
+
+        roll_nos = {r["roll_no"] for r in rows}
+        store = get_store()
+        done = set() if opts["reembed"] else set(store.live()[0].tolist())
+        todo = [
+            (s.id, s.photo.path) for s in Student.objects.only("id", "roll_no", "photo")
+            if s.roll_no in roll_nos and s.photo and s.id not in done
+        ]
+        self.stdout.write(
+            f"{len(rows)} rows: {created} students created, {skipped} already present, "
+            f"{len(todo)} to embed"
+        )
+
+        workers = opts["workers"] or default_workers()
+        total = len(todo)
+        embedded = 0
+        embed_started = time.perf_counter()
+
+        # Photos embedded before (same bytes) come straight from the cache.
+        cache = get_embedding_cache("batched") if EMBED_CACHE else None
+        digests = {}
+        if cache is not None:
+            cached_ids, cached, misses = [], [], []
+            for sid, path in todo:
+                digests[sid] = file_digest(path)
+                embedding = cache.get(digests[sid])
+                if embedding is None:
+                    misses.append((sid, path))
+                else:
+                    cached_ids.append(sid)
+                    cached.append(embedding)
+            if cached_ids:
+                store.put_many(cached_ids, cached)
+                embedded += len(cached_ids)
+                EnrollmentJob.objects.bulk_create(
+                    [EnrollmentJob(student_id=sid, status="DONE", attempts=1) for sid in cached_ids]
+                )
+                self.stdout.write(f"  {len(cached_ids)} embeddings from cache")
+            todo = misses
+
+        def on_batch(ids, embeddings, batch_failures):
+            nonlocal embedded
+            if ids:
+                # Saved per batch, so an interrupted run resumes where it stopped.
+                store.put_many(ids, embeddings)
+                embedded += len(ids)
+                if cache is not None:
+                    for sid, embedding in zip(ids, embeddings):
+                        cache.put(digests[sid], embedding)
+            EnrollmentJob.objects.bulk_create(
+                [EnrollmentJob(student_id=sid, status="DONE", attempts=1) for sid in ids]
+                + [EnrollmentJob(student_id=sid, status="FAILED", attempts=1, error=reason)
+                   for sid, reason in batch_failures]
+            )
+            failures.extend(f"student {sid}: {reason}" for sid, reason in batch_failures)
+            rate = embedded / (time.perf_counter() - embed_started)
+            self.stdout.write(f"  {embedded}/{total} embedded ({rate:.1f} photos/s)")
+
+        embed_students(todo, workers, opts["batch_size"], on_batch)
+
+        elapsed = time.perf_counter() - started
+        embed_elapsed = time.perf_counter() - embed_started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: {created} students created, {embedded} embedded "
+            f"({embedded / embed_elapsed if embed_elapsed else 0:.1f} photos/s on {workers} workers), "
+            f"{len(failures)} failures"
+        ))
+        if cache is not None:
+            self.stdout.write(f"Embedding cache: {cache.stats()}")
+        for failure in failures[:20]:
+            self.stdout.write(self.style.WARNING(f"  {failure}"))
+        if len(failures) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... and {len(failures) - 20} more"))
+
+    def _classrooms(self, names):
+        existing = {}
+        for pk, name in ClassRoom.objects.values_list("id", "name"):
+            existing.setdefault(name, pk)
+        missing = [ClassRoom(name=n) for n in sorted(names - existing.keys())]
+        if missing:
+            ClassRoom.objects.bulk_create(missing)
+            self.stdout.write(f"Created classrooms: {', '.join(c.name for c in missing)}")
+            for pk, name in ClassRoom.objects.filter(name__in=[c.name for c in missing]).values_list("id", "name"):
+                existing.setdefault(name, pk)
+        return existing
+
+    def _create_students(self, rows, classrooms, photo_dir, failures):
+        existing = set(Student.objects.values_list("roll_no", flat=True))
+        new, skipped = [], 0
+        for row in rows:
+            if row["roll_no"] in existing:
+                skipped += 1
+                continue
+            path = resolve_photo(photo_dir, row["photo"])
+            if not path.is_file():
+                failures.append(f"roll_no {row['roll_no']}: photo not found {path}")
+                continue
+            with open(path, "rb") as f:
+                name = default_storage.save(f"student_photos/{Path(path).name}", File(f))
+            new.append(Student(
+                roll_no=row["roll_no"],
+                name=row["name"],
+                classroom_id=classrooms[row["classroom"]],
+                photo=name,
+            ))
+        Student.objects.bulk_create(new, batch_size=500)
+        return len(new), skipped
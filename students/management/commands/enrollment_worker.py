@@ -0,0 +1,26 @@
+# students/management/commands/enrollment_worker.py
+
+from django.core.management.base import BaseCommand
+
+from students.enrollment import requeue_stale_jobs, run_pending, run_worker
+
+
+class Command(BaseCommand):
+    help = "Build queued student face embeddings in the background."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Run the jobs that are due now, then exit.")
+        parser.add_argument("--poll", type=float, default=2.0,
+                            help="Seconds between checks of an empty queue.")
+
+    def handle(self, *args, **opts):
+        if opts["once"]:
+            requeue_stale_jobs()
+            done = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} enrollment job(s)"))
+            return
+        try:
+            run_worker(poll_interval=opts["poll"])
+        except KeyboardInterrupt:
+            self.stdout.write("Enrollment worker stopped")
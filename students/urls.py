@@ -26,6 +26,7 @@ urlpatterns = [
     path('create/', views.student_create, name='student_create'),
     path('<int:pk>/update/', views.student_update, name='student_update'),
     path('<int:pk>/delete/', views.student_delete, name='student_delete'),
+    path('<int:pk>/enroll/', views.student_enroll, name='student_enroll'),
     
     # Teachers
     path('teachers/', views.teacher_list, name='teacher_list'),
@@ -1,11 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from .models import Student, ClassRoom, Teacher
+from .models import Student, StudentImage, ClassRoom, Teacher, EnrollmentJob
 from .forms import StudentForm, ClassRoomForm, TeacherForm
 
 from django.contrib import messages
-from .encoding_utils import create_encodings_for_student
+from django.db.models import OuterRef, Subquery
+from .encoding_utils import remove_encodings_for_student
+from .enrollment import enqueue_enrollment
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -62,10 +64,22 @@ def classroom_delete(request, pk):
 @login_required
 def student_list(request):
     """List all students"""
-    students = Student.objects.all()
+    latest_job = EnrollmentJob.objects.filter(student=OuterRef('pk')).order_by('-id')
+    students = Student.objects.select_related('classroom').annotate(
+        enrollment_status=Subquery(latest_job.values('status')[:1]),
+        enrollment_error=Subquery(latest_job.values('error')[:1]),
+    )
     return render(request, 'students/student_list.html', {'students': students})
 
 
+def _save_extra_images(student, form):
+    """Attach the form's extra photos to the student; returns how many."""
+    images = form.cleaned_data.get('extra_images') or []
+    for image in images:
+        StudentImage.objects.create(student=student, image=image)
+    return len(images)
+
+
 @login_required
 def student_create(request):
     """Create new student"""
@@ -74,15 +88,9 @@ def student_create(request):
         if form.is_valid():
             student = form.save()
             print(f"\n[STUDENT SAVE] ID: {student.id}, Photo: {student.photo}")
-            
-            try:
-                print(f"[ENCODING] Calling create_encodings_for_student({student.id})")
-                create_encodings_for_student(student)
-                print(f"[ENCODING] Success!")
-            except Exception as e:
-                print(f"[ENCODING ERROR] {e}")
-                import traceback
-                traceback.print_exc()
+            _save_extra_images(student, form)
+            # The embedding is built by the enrollment worker, not in this request.
+            enqueue_enrollment(student)
             
             messages.success(request, 'Student added successfully!')
             return redirect('students:student_list')
@@ -100,15 +108,9 @@ def student_update(request, pk):
         if form.is_valid():
             student = form.save()
             print(f"\n[STUDENT UPDATE] ID: {student.id}, Photo: {student.photo}")
-            
-            try:
-                print(f"[ENCODING] Calling create_encodings_for_student({student.id})")
-                create_encodings_for_student(student)
-                print(f"[ENCODING] Success!")
-            except Exception as e:
-                print(f"[ENCODING ERROR] {e}")
-                import traceback
-                traceback.print_exc()
+            added = _save_extra_images(student, form)
+            if 'photo' in form.changed_data or added:
+                enqueue_enrollment(student)
             
             messages.success(request, 'Student updated successfully!')
             return redirect('students:student_list')
@@ -117,12 +119,24 @@ def student_update(request, pk):
     return render(request, 'students/student_form.html', {'form': form, 'title': 'Edit Student'})
 
 
+@login_required
+def student_enroll(request, pk):
+    """Queue the face embedding of a student again, e.g. after a failure"""
+    student = get_object_or_404(Student, pk=pk)
+    if request.method == 'POST':
+        enqueue_enrollment(student)
+        messages.success(request, f'Face enrollment of {student.name} queued.')
+    return redirect('students:student_list')
+
+
 @login_required
 def student_delete(request, pk):
     """Delete student"""
     student = get_object_or_404(Student, pk=pk)
     if request.method == 'POST':
+        student_id = student.id
         student.delete()
+        remove_encodings_for_student(student_id)
         messages.success(request, 'Student deleted successfully!')
         return redirect('students:student_list')
     return render(request, 'students/student_confirm_delete.html', {'student': student})